@@ -1,7 +1,7 @@
 from pyramid.config import Configurator
 from pyramid.response import Response
-from waitress import serve
 import logging
+import os
 
 logging.basicConfig(
     level=logging.INFO,
@@ -9,16 +9,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+CORS_HEADERS = [
+    ('Access-Control-Allow-Origin', '*'),
+    ('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS'),
+    ('Access-Control-Allow-Headers', 'Content-Type, Authorization, X-Server-Timing'),
+    ('Access-Control-Max-Age', '3600'),
+    ('Access-Control-Expose-Headers', 'X-Next-Cursor, Server-Timing'),
+]
+
 class CORSMiddleware:
     def __init__(self, app):
         self.app = app
 
     def __call__(self, environ, start_response):
         def custom_start_response(status, headers, exc_info=None):
-            headers.append(('Access-Control-Allow-Origin', '*'))
-            headers.append(('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS'))
-            headers.append(('Access-Control-Allow-Headers', 'Content-Type, Authorization'))
-            headers.append(('Access-Control-Max-Age', '3600'))
+            headers.extend(CORS_HEADERS)
             return start_response(status, headers, exc_info)
 
         if environ['REQUEST_METHOD'] == 'OPTIONS':
@@ -29,6 +34,11 @@ class CORSMiddleware:
 
 def main(global_config, **settings):
     logger.info("Starting Product Review Analyzer API...")
+
+    # Schema changes run here, not when models is imported
+    if os.getenv('AUTO_MIGRATE', 'true').lower() == 'true':
+        from models import migrate
+        migrate()
     
     config = Configurator(settings=settings)
     
@@ -36,12 +46,37 @@ def main(global_config, **settings):
         config.include('cornice')
     except:
         pass
+
+    # request.dbsession, closed at the end of every request
+    config.include('db_session')
+    # Request counters/latency histograms and the optional Server-Timing header
+    config.include('metrics')
+    # Fast JSON renderer, gzip/brotli responses
+    config.include('http_encoding')
     
     config.add_route('health', '/')
+    config.add_route('ready', '/ready')
     config.add_route('analyze_review', '/api/analyze-review')
+    config.add_route('analyze_reviews', '/api/analyze-reviews')
+    config.add_route('get_job', '/api/jobs/{id}')
     config.add_route('get_reviews', '/api/reviews')
+    config.add_route('export_reviews', '/api/reviews/export')
+    config.add_route('search_reviews', '/api/reviews/search')
+    config.add_route('get_stats', '/api/stats')
+    config.add_route('product_summary', '/api/products/{product_name}/summary')
+    config.add_route('db_stats', '/api/db-stats')
+    config.add_route('metrics', '/metrics')
+    config.add_route('scheduler_stats', '/api/scheduler-stats')
+    config.add_route('cache_stats', '/api/cache-stats')
     
     config.scan('views')
+
+    from views import start_job_workers, start_warmup
+    start_job_workers()
+
+    # Load and warm both analyzers in the background; /ready reports when done
+    if os.getenv('PRELOAD_MODELS', 'true').lower() == 'true':
+        start_warmup()
     
     logger.info("Configuration completed successfully")
     
@@ -49,6 +84,8 @@ def main(global_config, **settings):
     return CORSMiddleware(app)
 
 if __name__ == '__main__':
+    from waitress import serve
+
     settings = {
         'pyramid.reload_templates': True,
         'pyramid.debug_authorization': False,
@@ -67,8 +104,20 @@ if __name__ == '__main__':
     logger.info("=" * 60)
     logger.info("Endpoints:")
     logger.info("  GET  / - Health check")
-    logger.info("  POST /api/analyze-review - Analyze review")
-    logger.info("  GET  /api/reviews - Get all reviews")
+    logger.info("  GET  /ready - Readiness (models warmed up)")
+    logger.info("  POST /api/analyze-review - Analyze review (?async=true queues key points)")
+    logger.info("  GET  /api/jobs/{id} - Async job status")
+    logger.info("  POST /api/analyze-reviews - Analyze reviews in bulk")
+    logger.info("  GET  /api/reviews - List reviews (keyset pagination, filters, fields)")
+    logger.info("  GET  /api/reviews/export - Stream all reviews (NDJSON/CSV)")
+    logger.info("  GET  /api/reviews/search?q= - Full-text search (ranked, paginated)")
+    logger.info("  GET  /api/stats - Sentiment statistics and trends")
+    logger.info("  GET  /api/products/{product_name}/summary - Aspect summary of a product")
+    logger.info("  GET  /metrics - Prometheus metrics")
+    logger.info("  GET  /api/db-stats - Database connection pool stats")
+    logger.info("  GET  /api/scheduler-stats - Inference scheduler stats")
+    logger.info("  GET  /api/cache-stats - Result cache stats")
+    logger.info("ASGI mode (event loop): uvicorn asgi:app --port 6543")
     logger.info("=" * 60)
     
     serve(app, host=host, port=port)
\ No newline at end of file
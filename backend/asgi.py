@@ -0,0 +1,305 @@
+"""
+ASGI entry point: the same API on an asyncio event loop.
+
+    pip install uvicorn
+    uvicorn asgi:app --host 0.0.0.0 --port 6543
+
+GET / and POST /api/analyze-review are handled here as coroutines: sentiment
+inference runs on the inference executor, the Gemini call on the Gemini
+executor (still limited by GeminiClient's concurrency and rate limits) and the
+insert on the database executor, and the request only awaits them; every
+step is the same views.py function the WSGI view calls. Every other route,
+GET /api/reviews included, is served by the Pyramid app from app.main on the
+database executor, streaming its body chunk by chunk. Those routes are
+mostly blocking database work that would run on the same executor natively,
+so they share the event loop's concurrency limits but gain no speed. The
+thread count is the sum of the executor sizes no matter how many requests are
+in flight, so thousands of open requests are just suspended coroutines.
+
+`python app.py` (waitress) keeps working as before.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+ASGI_INFERENCE_THREADS = int(os.getenv('ASGI_INFERENCE_THREADS', '8'))
+ASGI_GEMINI_THREADS = int(os.getenv('ASGI_GEMINI_THREADS', '16'))
+ASGI_DB_THREADS = int(os.getenv('ASGI_DB_THREADS', str(
+    int(os.getenv('DB_POOL_SIZE', '10')) + int(os.getenv('DB_MAX_OVERFLOW', '20'))
+)))
+ASGI_MAX_BODY_BYTES = int(os.getenv('ASGI_MAX_BODY_BYTES', str(1024 * 1024)))
+
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ASGIApp:
+    def __init__(self, settings=None):
+        self.settings = settings or {}
+        self.wsgi_app = None
+        self._startup_lock = threading.Lock()
+        self.inference_executor = ThreadPoolExecutor(ASGI_INFERENCE_THREADS, thread_name_prefix='asgi-inference')
+        self.gemini_executor = ThreadPoolExecutor(ASGI_GEMINI_THREADS, thread_name_prefix='asgi-gemini')
+        self.db_executor = ThreadPoolExecutor(ASGI_DB_THREADS, thread_name_prefix='asgi-db')
+        self.routes = {
+            ('GET', '/'): ('health', self.health),
+            ('POST', '/api/analyze-review'): ('analyze_review', self.analyze_review),
+        }
+
+    def startup(self):
+        """Build the Pyramid app once: migrations, job workers and model warmup"""
+        with self._startup_lock:
+            if self.wsgi_app is None:
+                from app import main
+                self.wsgi_app = main({}, **self.settings)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if self.wsgi_app is None:
+            await asyncio.get_running_loop().run_in_executor(self.db_executor, self.startup)
+
+        method = scope['method']
+        if method == 'OPTIONS':
+            await self.respond(send, 200, b'', 'text/plain')
+            return
+
+        route = self.routes.get((method, scope['path'].rstrip('/') or '/'))
+        if route is None:
+            await self.call_wsgi(scope, receive, send)
+            return
+
+        import metrics
+        name, handler = route
+        started = time.perf_counter()
+        status = 500
+        try:
+            status, body = await handler(scope, receive)
+        except BodyTooLarge:
+            status, body = 413, {'error': 'Request terlalu besar'}
+        except PoolTimeoutError:
+            # Same answer as db_session.pool_timeout_tween on the WSGI side
+            logger.error("Database connection pool exhausted")
+            status, body = 503, {'error': 'Server sedang sibuk. Coba lagi nanti.'}
+        except Exception as e:
+            logger.error(f"Unexpected error in {name}: {e}")
+            logger.error(traceback.format_exc())
+            body = {'error': 'Error server. Coba lagi nanti.'}
+        finally:
+            if metrics.ENABLED:
+                metrics.REQUESTS.inc(name, method, status)
+                metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, name)
+        await self.respond(send, status, json.dumps(body).encode('utf-8'), JSON_CONTENT_TYPE)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await asyncio.get_running_loop().run_in_executor(self.db_executor, self.startup)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in (self.inference_executor, self.gemini_executor, self.db_executor):
+                    executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def respond(self, send, status, body, content_type):
+        from app import CORS_HEADERS
+        headers = [(b'content-type', content_type.encode('latin-1')),
+                   (b'content-length', str(len(body)).encode('latin-1'))]
+        headers.extend((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in CORS_HEADERS)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def read_body(self, receive, limit=ASGI_MAX_BODY_BYTES):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if limit is not None and size > limit:
+                raise BodyTooLarge()
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def run(self, executor, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def health(self, scope, receive):
+        from views import health_check
+        return 200, health_check(None)
+
+    async def analyze_review(self, scope, receive):
+        """POST /api/analyze-review, same contract as views.analyze_review"""
+        import views
+
+        try:
+            data = json.loads(await self.read_body(receive))
+        except ValueError as e:
+            logger.error(f"Failed to parse JSON: {e}")
+            return 400, {'error': 'Format JSON tidak valid'}
+
+        fields, error = views.parse_review_input(data)
+        if error:
+            return 400, {'error': error}
+
+        if views.DEDUP_ENABLED:
+            duplicate = await self.run(self.db_executor, self.copy_duplicate, fields)
+            if duplicate is not None:
+                return 200, duplicate
+
+        try:
+            sentiment_result = await self.run(
+                self.inference_executor, views.analyze_sentiment_cached, fields['review_text'], fields['language']
+            )
+        except Exception as e:
+            logger.error(f"Sentiment analysis failed: {e}")
+            return 500, {'error': 'Analisis sentimen gagal. Coba lagi.'}
+
+        params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        async_mode = params['async'][-1] if 'async' in params else data.get('async', False)
+        if views.is_truthy(async_mode):
+            try:
+                body = await self.run(self.db_executor, self.save_review, fields, sentiment_result, None, True)
+            except PoolTimeoutError:
+                raise
+            except Exception as e:
+                logger.error(f"Database error: {e}")
+                return 500, {'error': 'Gagal menyimpan review ke database'}
+            views.notify_job_workers()
+            return 202, body
+
+        try:
+            gemini = await self.run(self.gemini_executor, views.get_gemini_analyzer)
+            key_points = await self.run(
+                self.gemini_executor, views.extract_key_points_cached, gemini, fields['review_text'], fields['language']
+            )
+        except Exception as e:
+            logger.error(f"Gemini analysis failed: {e}")
+            key_points = views.fallback_key_points(fields['language'])
+
+        try:
+            body = await self.run(self.db_executor, self.save_review, fields, sentiment_result, key_points, False)
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error(f"Database error: {e}")
+            return 500, {'error': 'Gagal menyimpan review ke database'}
+        return 200, body
+
+    def copy_duplicate(self, fields):
+        """Runs on the database executor; body of the saved copy or None"""
+        from models import Session
+        from views import copy_duplicate
+
+        session = Session()
+        try:
+            review = copy_duplicate(session, fields)
+            return review.to_dict() if review is not None else None
+        finally:
+            session.close()
+
+    def save_review(self, fields, sentiment_result, key_points, queue_key_points):
+        """Runs on the database executor; returns the response body"""
+        from models import Session
+        from views import queued_review_body, save_analyzed_review
+
+        session = Session()
+        try:
+            review, job = save_analyzed_review(session, fields, sentiment_result, key_points, queue_key_points)
+            if job is None:
+                return review.to_dict()
+            return queued_review_body(review, job, f'/api/jobs/{job.id}')
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    async def call_wsgi(self, scope, receive, send):
+        """Serve the request with the Pyramid app on the database executor"""
+        body = await self.read_body(receive, limit=None)
+        environ = self.wsgi_environ(scope, body)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            return lambda data: None
+
+        iterable = await self.run(self.db_executor, self.wsgi_app, environ, start_response)
+        iterator = iter(iterable)
+        sentinel = object()
+        try:
+            chunk = await self.run(self.db_executor, next, iterator, sentinel)
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+            while chunk is not sentinel:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await self.run(self.db_executor, next, iterator, sentinel)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                await self.run(self.db_executor, close)
+
+    @staticmethod
+    def wsgi_environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+
+app = ASGIApp()
@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+"""
+Load-testing and latency benchmark for the analyze pipeline.
+
+Drives the WSGI app from app.main in-process and over waitress, with Gemini
+served by gemini_stub_server.py and (by default) a fake sentiment model whose
+cost is configurable, so runs are reproducible without network or GPU.
+
+    python benchmark.py run                                # all scenarios, fake model
+    python benchmark.py run --sentiment real               # real SentimentAnalyzer
+    python benchmark.py run --scenarios analyze,reviews --table-sizes 1000,100000
+    python benchmark.py compare benchmark_results/a.json benchmark_results/b.json
+
+Every run writes a JSON file (throughput, p50/p95/p99 latency, memory, git
+commit and settings) that `compare` can diff between commits.
+"""
+from datetime import datetime, timedelta
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SCENARIOS = ('analyze', 'analyze-waitress', 'reviews', 'sentiment-batch')
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, int(round(q * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+
+def summarize(latencies, errors, wall_seconds, items=None):
+    samples = sorted(latencies)
+    count = len(samples)
+    return {
+        'requests': count,
+        'errors': errors,
+        'wall_seconds': round(wall_seconds, 4),
+        'throughput_per_second': round((items or count) / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'mean': round(sum(samples) / count * 1000, 3) if count else None,
+            'p50': round(percentile(samples, 0.50) * 1000, 3) if count else None,
+            'p95': round(percentile(samples, 0.95) * 1000, 3) if count else None,
+            'p99': round(percentile(samples, 0.99) * 1000, 3) if count else None,
+            'max': round(samples[-1] * 1000, 3) if count else None,
+        },
+    }
+
+
+def memory_snapshot():
+    """Current and peak resident memory of this process in MB (Linux/macOS)"""
+    snapshot = {}
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        snapshot['peak_rss_mb'] = round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        snapshot['rss_mb'] = round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    return snapshot
+
+
+def run_load(call, total, concurrency):
+    """Run `call(number)` `total` times from `concurrency` threads"""
+    latencies = []
+    errors = [0]
+    counter = iter(range(total))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                number = next(counter, None)
+            if number is None:
+                return
+            started = time.perf_counter()
+            try:
+                ok = call(number)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - started
+
+
+class FakeSentimentAnalyzer:
+    """Stands in for SentimentAnalyzer: sleeps base + per-item cost per batch"""
+    model_name = 'benchmark-fake'
+    model_id = 'benchmark-fake:sleep'
+
+    def __init__(self, base_ms=20.0, per_item_ms=5.0):
+        self.base = base_ms / 1000.0
+        self.per_item = per_item_ms / 1000.0
+        self.batch_size = 16
+
+    def analyze_batch(self, texts, batch_size=None):
+        time.sleep(self.base + self.per_item * len(texts))
+        return [
+            {'sentiment': 'positive' if len(text) % 2 else 'negative', 'confidence_score': 0.9}
+            for text in texts
+        ]
+
+    def analyze(self, text):
+        return self.analyze_batch([text])[0]
+
+
+def review_text(number):
+    # Unique per request so the result cache never short-circuits the pipeline; the
+    # texts differ only by the number, so near-duplicate detection is off unless --dedup
+    return f"Review benchmark nomor {number}: baterai awet, pengiriman cepat, harga sepadan."
+
+
+def wsgi_request(app, method, path, body=None):
+    """Call the WSGI app directly; returns the HTTP status code"""
+    from wsgiref.util import setup_testing_defaults
+
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    path, _, query = path.partition('?')
+    environ = {}
+    setup_testing_defaults(environ)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload),
+    })
+    status = {}
+
+    def start_response(status_line, headers, exc_info=None):
+        status['code'] = int(status_line.split()[0])
+
+    result = app(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return status['code']
+
+
+def bench_analyze_inprocess(app, args):
+    def call(number):
+        body = {'review_text': review_text(number), 'product_name': 'Benchmark', 'language': 'id'}
+        return wsgi_request(app, 'POST', '/api/analyze-review', body) == 200
+
+    return summarize(*run_load(call, args.requests, args.concurrency))
+
+
+def bench_analyze_waitress(app, args):
+    import http.client
+    from waitress import create_server
+
+    server = create_server(app, host='127.0.0.1', port=0, threads=args.waitress_threads)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    port = server.effective_port
+    local = threading.local()
+
+    def call(number):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        body = json.dumps({'review_text': review_text(number), 'product_name': 'Benchmark', 'language': 'id'})
+        try:
+            local.connection.request('POST', '/api/analyze-review', body, {'Content-Type': 'application/json'})
+            response = local.connection.getresponse()
+            response.read()
+            return response.status == 200
+        except (http.client.HTTPException, OSError):
+            local.connection.close()
+            del local.connection
+            raise
+
+    def close_channels():
+        # Runs on the server thread, so no socket is closed under its poll();
+        # the loop returns once the map is empty
+        for channel in list(server._map.values()):
+            channel.close()
+
+    try:
+        result = summarize(*run_load(call, args.requests, args.concurrency))
+    finally:
+        server.task_dispatcher.shutdown()
+        server.trigger.pull_trigger(close_channels)
+        thread.join(timeout=10)
+    result['waitress_threads'] = args.waitress_threads
+    return result
+
+
+def seed_reviews(target):
+    """Grow the reviews table to `target` rows with bulk inserts"""
+    from models import Session, Review, bump_version
+    session = Session()
+    try:
+        existing = session.query(Review).count()
+        start = datetime.utcnow() - timedelta(days=365)
+        rows = []
+        for number in range(existing, target):
+            rows.append({
+                'review_text': review_text(number),
+                'product_name': f'Produk {number % 50}',
+                'language': 'id' if number % 3 else 'en',
+                'sentiment': ('positive', 'negative', 'neutral')[number % 3],
+                'confidence_score': 0.8,
+                'key_points': '- baterai awet\n- pengiriman cepat',
+                'created_at': start + timedelta(seconds=number * 30),
+            })
+            if len(rows) >= 5000:
+                session.bulk_insert_mappings(Review, rows)
+                session.commit()
+                rows = []
+        if rows:
+            session.bulk_insert_mappings(Review, rows)
+        bump_version(session)
+        session.commit()
+    finally:
+        session.close()
+
+
+def bench_reviews(app, args):
+    results = {}
+    for size in args.table_sizes:
+        seed_reviews(size)
+        first_page = summarize(*run_load(
+            lambda number: wsgi_request(app, 'GET', '/api/reviews') == 200,
+            args.requests, args.concurrency
+        ))
+        filtered = summarize(*run_load(
+            lambda number: wsgi_request(
+                app, 'GET', f'/api/reviews?product_name=Produk%20{number % 50}&fields=id,sentiment'
+            ) == 200,
+            args.requests, args.concurrency
+        ))
+        results[str(size)] = {'first_page': first_page, 'filtered_projection': filtered, 'memory': memory_snapshot()}
+    return results
+
+
+def bench_sentiment_batch(analyzer, args):
+    results = {}
+    total = args.batch_texts
+    texts = [review_text(number) for number in range(total)]
+    for batch_size in args.batch_sizes:
+        batches = [texts[start:start + batch_size] for start in range(0, total, batch_size)]
+        latencies = []
+        started = time.perf_counter()
+        for batch in batches:
+            batch_started = time.perf_counter()
+            analyzer.analyze_batch(batch, batch_size=batch_size)
+            latencies.append(time.perf_counter() - batch_started)
+        wall = time.perf_counter() - started
+        result = summarize(latencies, 0, wall, items=total)
+        result['texts'] = total
+        results[str(batch_size)] = result
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    # Configure the app before views/models read the environment
+    database_dir = tempfile.mkdtemp(prefix='review-bench-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(database_dir, 'bench.db')}"
+    os.environ['PRELOAD_MODELS'] = 'false'
+    os.environ['JOB_WORKERS'] = '0'
+    os.environ['RESULT_CACHE_ENABLED'] = 'true' if args.cache else 'false'
+    os.environ['DEDUP_ENABLED'] = 'true' if args.dedup else 'false'
+
+    from gemini_stub_server import start_stub_server
+    stub, stub_url = start_stub_server(latency_ms=args.gemini_latency_ms, jitter_ms=args.gemini_latency_ms / 4)
+    os.environ['GEMINI_API_ENDPOINT'] = stub_url
+    os.environ['GEMINI_API_KEY'] = os.getenv('GEMINI_API_KEY') or 'benchmark'
+    # Measure the pipeline, not our own quota limits (unless asked to)
+    os.environ['GEMINI_REQUESTS_PER_MINUTE'] = str(args.gemini_rpm)
+    os.environ['GEMINI_MAX_CONCURRENCY'] = str(max(args.concurrency, args.waitress_threads))
+
+    import logging
+    logging.disable(logging.ERROR)
+
+    import views
+    from app import main
+
+    if args.sentiment == 'real':
+        # Process pool (SENTIMENT_PROCESSES) and scheduler as configured
+        views.sentiment_analyzer = views.load_sentiment_analyzer()
+    else:
+        # The pool workers load the real model, so the fake runs in-process
+        views.sentiment_analyzer = views.wrap_sentiment_analyzer(
+            FakeSentimentAnalyzer(args.fake_base_ms, args.fake_per_item_ms)
+        )
+
+    app = main({})
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'settings': {
+            key: value for key, value in vars(args).items() if key not in ('func', 'output')
+        },
+        'environment': {
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'cpu_count': os.cpu_count(),
+            'scheduler_enabled': views.SCHEDULER_ENABLED,
+        },
+        'results': {},
+    }
+
+    runners = {
+        'analyze': lambda: bench_analyze_inprocess(app, args),
+        'analyze-waitress': lambda: bench_analyze_waitress(app, args),
+        'reviews': lambda: bench_reviews(app, args),
+        'sentiment-batch': lambda: bench_sentiment_batch(raw_analyzer, args),
+    }
+    for scenario in args.scenarios:
+        print(f"Running {scenario}...", flush=True)
+        result = runners[scenario]()
+        if isinstance(result, dict) and 'latency_ms' in result:
+            result['memory'] = memory_snapshot()
+        report['results'][scenario] = result
+    report['gemini_stub_requests'] = stub.state.requests
+    report['memory'] = memory_snapshot()
+    stub.shutdown()
+
+    output = args.output
+    if not output:
+        os.makedirs('benchmark_results', exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join('benchmark_results', f"{stamp}-{report['commit'] or 'nogit'}.json")
+    with open(output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+
+    print_report(report)
+    print(f"\nResults saved to {output}")
+
+
+def flatten(results, prefix=''):
+    """{'analyze': {...summary...}} -> {'analyze': summary, 'reviews.1000.first_page': summary}"""
+    flat = {}
+    for name, value in results.items():
+        key = f'{prefix}{name}'
+        if isinstance(value, dict) and 'latency_ms' in value:
+            flat[key] = value
+        elif isinstance(value, dict):
+            flat.update(flatten(value, key + '.'))
+    return flat
+
+
+def print_report(report):
+    print(f"\nCommit {report['commit']}  {report['timestamp']}")
+    print(f"{'scenario':45} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>7}")
+    for name, summary in flatten(report['results']).items():
+        latency = summary['latency_ms']
+        print(f"{name:45} {summary['throughput_per_second'] or 0:>10} {latency['p50'] or 0:>10} "
+              f"{latency['p95'] or 0:>10} {latency['p99'] or 0:>10} {summary['errors']:>7}")
+    print(f"Memory: {report['memory']}")
+
+
+def compare(args):
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.candidate) as handle:
+        candidate = json.load(handle)
+    old, new = flatten(baseline['results']), flatten(candidate['results'])
+
+    def change(before, after):
+        if not before or after is None:
+            return '    n/a'
+        return f'{(after - before) / before * 100:+7.1f}%'
+
+    print(f"{baseline['commit']} -> {candidate['commit']}")
+    print(f"{'scenario':45} {'req/s':>10} {'change':>8} {'p95 ms':>10} {'change':>8}")
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        print(f"{name:45} {after['throughput_per_second'] or 0:>10} "
+              f"{change(before['throughput_per_second'], after['throughput_per_second']):>8} "
+              f"{after['latency_ms']['p95'] or 0:>10} "
+              f"{change(before['latency_ms']['p95'], after['latency_ms']['p95']):>8}")
+    for name in sorted(set(old) ^ set(new)):
+        print(f"{name:45} only in {'baseline' if name in old else 'candidate'}")
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the review analysis pipeline')
+    commands = parser.add_subparsers(dest='command')
+
+    run_parser = commands.add_parser('run', help='run the benchmark scenarios')
+    run_parser.add_argument('--scenarios', type=lambda value: value.split(','), default=list(SCENARIOS),
+                            help=f"comma separated subset of {','.join(SCENARIOS)}")
+    run_parser.add_argument('--requests', type=int, default=200)
+    run_parser.add_argument('--concurrency', type=int, default=16)
+    run_parser.add_argument('--waitress-threads', type=int, default=16)
+    run_parser.add_argument('--table-sizes', type=int_list, default=[1000, 10000, 50000])
+    run_parser.add_argument('--batch-sizes', type=int_list, default=[1, 4, 16, 32])
+    run_parser.add_argument('--batch-texts', type=int, default=128)
+    run_parser.add_argument('--sentiment', choices=('fake', 'real'), default='fake')
+    run_parser.add_argument('--fake-base-ms', type=float, default=20.0)
+    run_parser.add_argument('--fake-per-item-ms', type=float, default=5.0)
+    run_parser.add_argument('--gemini-latency-ms', type=float, default=50.0)
+    run_parser.add_argument('--gemini-rpm', type=float, default=1000000,
+                            help='GeminiClient rate limit during the run (default: effectively unlimited)')
+    run_parser.add_argument('--cache', action='store_true', help='keep the result cache enabled')
+    run_parser.add_argument('--dedup', action='store_true', help='keep near-duplicate detection enabled')
+    run_parser.add_argument('--database-url', help='defaults to a fresh temporary SQLite file')
+    run_parser.add_argument('--output', help='result file (default benchmark_results/<time>-<commit>.json)')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='diff two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(sys.argv[1:] or ['run'])
+    unknown = [scenario for scenario in getattr(args, 'scenarios', []) if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
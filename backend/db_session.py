@@ -0,0 +1,49 @@
+"""
+Request-scoped database sessions for Pyramid.
+
+`config.include('db_session')` adds `request.dbsession`: created on first
+use, rolled back if the request raised and always closed when the request
+finishes, so an exception in a view can no longer leak a pooled connection.
+A tween turns pool exhaustion into a 503 instead of a generic 500.
+"""
+import json
+import logging
+
+from pyramid.response import Response
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+def get_dbsession(request):
+    from models import Session
+    session = Session()
+
+    def cleanup(request):
+        try:
+            if request.exception is not None:
+                session.rollback()
+        finally:
+            session.close()
+
+    request.add_finished_callback(cleanup)
+    return session
+
+
+def pool_timeout_tween_factory(handler, registry):
+    def pool_timeout_tween(request):
+        try:
+            return handler(request)
+        except PoolTimeoutError:
+            logger.error("Database connection pool exhausted")
+            return Response(
+                json.dumps({'error': 'Server sedang sibuk. Coba lagi nanti.'}),
+                status=503,
+                content_type='application/json; charset=utf-8'
+            )
+    return pool_timeout_tween
+
+
+def includeme(config):
+    config.add_request_method(get_dbsession, 'dbsession', reify=True)
+    config.add_tween('db_session.pool_timeout_tween_factory')
@@ -0,0 +1,221 @@
+"""
+Near-duplicate detection for review spam (same text with small edits).
+
+Every review is reduced to a MinHash signature over character 5-grams of its
+normalized text (one permutation hashing: each shingle is hashed once and
+lands in one of NUM_HASHES bins, so the cost is linear in the text length).
+The signature is cut into BANDS bands; reviews sharing a band bucket are
+candidates, and a candidate is a duplicate when the estimated Jaccard
+similarity of the signatures reaches DEDUP_THRESHOLD. Signatures and buckets
+live in review_signatures / review_lsh_buckets and are added together with
+every saved review.
+
+    python dedup.py scan              # rebuild the index and link duplicates
+    python dedup.py scan --dry-run    # only count them
+"""
+import hashlib
+import logging
+import os
+import struct
+import time
+
+from result_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.85'))
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+_EMPTY = (1 << 64) - 1
+_PACK = struct.Struct(f'<{NUM_HASHES}Q')
+
+
+def shingles(text):
+    text = normalize_text(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """Tuple of NUM_HASHES minimum hash values"""
+    mins = [_EMPTY] * NUM_HASHES
+    for shingle in shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        index, value = value % NUM_HASHES, value // NUM_HASHES
+        if value < mins[index]:
+            mins[index] = value
+    # Densify: an empty bin borrows the next filled one, so short texts still compare
+    if _EMPTY in mins and any(value != _EMPTY for value in mins):
+        for index in range(NUM_HASHES):
+            offset = 1
+            while mins[index] == _EMPTY:
+                candidate = mins[(index + offset) % NUM_HASHES]
+                if candidate != _EMPTY:
+                    mins[index] = candidate
+                offset += 1
+    return tuple(mins)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_HASHES
+
+
+def buckets(sig):
+    keys = []
+    for band in range(BANDS):
+        raw = _PACK.pack(*sig)[band * ROWS * 8:(band + 1) * ROWS * 8]
+        keys.append(f'{band:02d}:{hashlib.blake2b(raw, digest_size=8).hexdigest()}')
+    return keys
+
+
+def pack(sig):
+    return _PACK.pack(*sig)
+
+
+def unpack(data):
+    return _PACK.unpack(data)
+
+
+def find_duplicate(session, text, language=None, threshold=None):
+    """
+    Most similar indexed review with key points, when it reaches `threshold`
+    and has the same language; None otherwise. Reviews that only have the
+    Gemini fallback placeholder are no source, their duplicates get a real
+    extraction instead
+    """
+    from models import Review, ReviewLshBucket, ReviewSignature
+    from product_summary import bullets
+
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    sig = signature(text)
+    query = (
+        session.query(ReviewSignature.review_id, ReviewSignature.signature, Review.key_points)
+        .join(ReviewLshBucket, ReviewLshBucket.review_id == ReviewSignature.review_id)
+        .join(Review, Review.id == ReviewSignature.review_id)
+        .filter(ReviewLshBucket.bucket.in_(buckets(sig)), Review.key_points.isnot(None))
+    )
+    if language:
+        query = query.filter(Review.language == language)
+
+    best_id, best_score = None, threshold
+    for review_id, packed, key_points in query.distinct():
+        if not any(bullets(key_points)):
+            continue
+        score = similarity(sig, unpack(packed))
+        if score >= best_score:
+            best_id, best_score = review_id, score
+    if best_id is None:
+        return None
+    logger.info(f"Near-duplicate of review {best_id} (similarity {best_score:.2f})")
+    return session.get(Review, best_id)
+
+
+def index_reviews(session, reviews):
+    """Add (review_id, review_text) pairs to the index in the caller's transaction"""
+    from models import ReviewLshBucket, ReviewSignature
+
+    signatures, bucket_rows = [], []
+    for review_id, text in reviews:
+        sig = signature(text)
+        signatures.append({'review_id': review_id, 'signature': pack(sig)})
+        bucket_rows.extend({'bucket': key, 'review_id': review_id} for key in buckets(sig))
+    if signatures:
+        session.bulk_insert_mappings(ReviewSignature, signatures)
+        session.bulk_insert_mappings(ReviewLshBucket, bucket_rows)
+
+
+def scan(threshold=None, chunk_rows=2000, dry_run=False):
+    """
+    Rebuild the index over all reviews in id order. A review similar to an
+    earlier one is linked to it (duplicate_of) instead of being indexed.
+    """
+    from models import Review, ReviewLshBucket, ReviewSignature, Session, bump_version
+    from sqlalchemy import update
+
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    started = time.monotonic()
+    index = {}       # bucket -> [review_id]
+    signatures = {}  # review_id -> signature
+    scanned = linked = 0
+
+    session = Session()
+    try:
+        if not dry_run:
+            session.query(ReviewLshBucket).delete()
+            session.query(ReviewSignature).delete()
+            session.execute(update(Review).where(Review.duplicate_of.isnot(None)).values(duplicate_of=None))
+            bump_version(session)
+            session.commit()
+
+        last_id = 0
+        while True:
+            rows = (
+                session.query(Review.id, Review.review_text, Review.language)
+                .filter(Review.id > last_id)
+                .order_by(Review.id)
+                .limit(chunk_rows)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            new_entries, links = [], []
+            for row in rows:
+                scanned += 1
+                sig = signature(row.review_text)
+                keys = [f'{row.language or "id"}|{key}' for key in buckets(sig)]
+                best_id, best_score = None, threshold
+                for candidate in {review_id for key in keys for review_id in index.get(key, ())}:
+                    score = similarity(sig, signatures[candidate])
+                    if score >= best_score:
+                        best_id, best_score = candidate, score
+                if best_id is not None:
+                    links.append({'review_id': row.id, 'original_id': best_id})
+                    continue
+                signatures[row.id] = sig
+                for key in keys:
+                    index.setdefault(key, []).append(row.id)
+                new_entries.append((row.id, row.review_text))
+
+            linked += len(links)
+            if not dry_run:
+                index_reviews(session, new_entries)
+                for link in links:
+                    session.execute(
+                        update(Review).where(Review.id == link['review_id']).values(duplicate_of=link['original_id'])
+                    )
+                if links:
+                    bump_version(session)
+                session.commit()
+            logger.info(f"Scanned {scanned} reviews, {linked} near-duplicates")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    logger.info(f"Dedup scan finished in {time.monotonic() - started:.1f}s: {scanned} reviews, {linked} near-duplicates")
+    return {'scanned': scanned, 'duplicates': linked}
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Near-duplicate review index')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    scan_parser = subparsers.add_parser('scan', help='rebuild the index and link near-duplicates')
+    scan_parser.add_argument('--threshold', type=float, default=DEDUP_THRESHOLD)
+    scan_parser.add_argument('--dry-run', action='store_true', help='count duplicates without writing')
+    args = parser.parse_args()
+
+    from models import migrate
+    migrate()
+    print(scan(threshold=args.threshold, dry_run=args.dry_run))
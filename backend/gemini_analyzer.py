@@ -1,5 +1,6 @@
-import google.generativeai as genai
+import json
 import os
+import re
 from dotenv import load_dotenv
 import logging
 
@@ -13,9 +14,31 @@ class GeminiAnalyzer:
             logger.error("GEMINI_API_KEY not found in environment variables")
             raise ValueError("GEMINI_API_KEY is required")
         
-        genai.configure(api_key=api_key)
+        # Imported here so importing this module stays cheap
+        import google.generativeai as genai
+        from gemini_client import GeminiClient
+
+        # GEMINI_API_ENDPOINT points the REST transport at another host, e.g. gemini_stub_server.py
+        endpoint = os.getenv('GEMINI_API_ENDPOINT')
+        if endpoint:
+            genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': endpoint})
+        else:
+            genai.configure(api_key=api_key)
         # Using gemini-2.5-flash which is available and recommended
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model_name = 'gemini-2.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        self.client = GeminiClient(
+            self.model,
+            max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', '4')),
+            requests_per_minute=float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60')),
+            timeout=float(os.getenv('GEMINI_TIMEOUT', '30')),
+            max_retries=int(os.getenv('GEMINI_MAX_RETRIES', '2')),
+            backoff_base=float(os.getenv('GEMINI_BACKOFF_BASE', '1.0')),
+            hedge=os.getenv('GEMINI_HEDGE', 'false').lower() == 'true',
+            hedge_delay=float(os.getenv('GEMINI_HEDGE_DELAY_MS', '2000')) / 1000.0
+        )
+        # Reviews packed into one prompt by extract_key_points_batch
+        self.batch_size = int(os.getenv('GEMINI_BATCH_SIZE', '10'))
         logger.info("Gemini analyzer initialized successfully with gemini-2.5-flash")
     
     def extract_key_points(self, review_text, language='id'):
@@ -41,10 +64,103 @@ Review: {review_text}
 Format respons sebagai bullet points (gunakan - untuk bullets). PENTING: Jawab dalam Bahasa Indonesia!"""
 
             logger.info("Sending request to Gemini API...")
-            response = self.model.generate_content(prompt)
+            text = self.client.generate(prompt)
             logger.info("Gemini response received successfully")
-            return response.text
+            return text
 
         except Exception as e:
             logger.error(f"Gemini analysis error: {e}", exc_info=True)
-            return "- Unable to extract key points at this time" if language == 'en' else "- Tidak bisa ekstrak poin penting saat ini"
\ No newline at end of file
+            return "- Unable to extract key points at this time" if language == 'en' else "- Tidak bisa ekstrak poin penting saat ini"
+
+    def extract_key_points_batch(self, items, batch_size=None):
+        """
+        Extract key points for many reviews with few Gemini calls
+        `items` is a list of (review_text, language); reviews are grouped by language
+        and packed `batch_size` per prompt. Items missing from or unparseable in the
+        structured answer fall back to extract_key_points one by one.
+        Returns: list of bullet point strings in the same order as `items`
+        """
+        batch_size = batch_size or self.batch_size
+        results = [None] * len(items)
+
+        by_language = {}
+        for position, (review_text, language) in enumerate(items):
+            by_language.setdefault('en' if language == 'en' else 'id', []).append(position)
+
+        for language, positions in by_language.items():
+            for start in range(0, len(positions), batch_size):
+                chunk = positions[start:start + batch_size]
+                parsed = self._extract_chunk([items[position][0] for position in chunk], language)
+                for number, position in enumerate(chunk):
+                    results[position] = parsed.get(number)
+
+        missing = [position for position, key_points in enumerate(results) if not key_points]
+        if missing:
+            logger.warning(f"Batched extraction missed {len(missing)} of {len(items)} reviews, retrying one by one")
+        for position in missing:
+            review_text, language = items[position]
+            results[position] = self.extract_key_points(review_text, language=language)
+        return results
+
+    def _extract_chunk(self, review_texts, language):
+        """One structured prompt for several reviews; returns {index: bullet string}"""
+        reviews = json.dumps(
+            [{'id': number, 'review': text} for number, text in enumerate(review_texts)],
+            ensure_ascii=False
+        )
+        if language == 'en':
+            prompt = f"""Analyze each product review below and extract 3-5 key points for each one.
+Be concise and focus on the most important aspects mentioned.
+
+Reviews (JSON):
+{reviews}
+
+Answer ONLY with a JSON array with one object per review: [{{"id": <review id>, "key_points": ["...", "..."]}}]. IMPORTANT: Write the key points in English."""
+        else:
+            prompt = f"""Analisis setiap review produk di bawah ini dan ekstrak 3-5 poin penting untuk masing-masing review.
+Singkat dan fokus pada aspek-aspek paling penting yang disebutkan.
+
+Reviews (JSON):
+{reviews}
+
+Jawab HANYA dengan array JSON berisi satu objek per review: [{{"id": <id review>, "key_points": ["...", "..."]}}]. PENTING: Tulis poin penting dalam Bahasa Indonesia!"""
+
+        try:
+            logger.info(f"Sending batched request for {len(review_texts)} reviews to Gemini API...")
+            text = self.client.generate(prompt, generation_config={'response_mime_type': 'application/json'})
+            return self._parse_batch_response(text, len(review_texts))
+        except Exception as e:
+            logger.error(f"Gemini batched analysis error: {e}")
+            return {}
+
+    @staticmethod
+    def _parse_batch_response(text, count):
+        # Strip a ```json fence if the model added one
+        text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text.strip())
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return {}
+        if isinstance(data, dict):
+            data = data.get('reviews') or data.get('results') or []
+
+        parsed = {}
+        for entry in data if isinstance(data, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            number = entry.get('id')
+            points = entry.get('key_points')
+            if not isinstance(number, int) or not 0 <= number < count:
+                continue
+            if isinstance(points, str):
+                points = [line for line in points.splitlines() if line.strip()]
+            if not isinstance(points, list):
+                continue
+            bullets = [str(point).strip().lstrip('-*• ').strip() for point in points]
+            bullets = [bullet for bullet in bullets if bullet]
+            if bullets:
+                parsed[number] = '\n'.join(f'- {bullet}' for bullet in bullets)
+        return parsed
+
+    def stats(self):
+        return self.client.stats()
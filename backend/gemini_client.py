@@ -0,0 +1,205 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import deque
+import logging
+import random
+import threading
+import time
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiBusyError(Exception):
+    """No concurrency slot or rate limit token became free within the timeout"""
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding at most `burst` tokens"""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(rate_per_minute // 6)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self, timeout):
+        """Block until a token is available; False when `timeout` runs out first"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                needed = (1 - self.tokens) / self.rate if self.rate > 0 else timeout
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(needed, remaining))
+
+
+class GeminiClient:
+    """
+    Wraps GenerativeModel.generate_content with the limits a shared quota needs:
+
+    - at most `max_concurrency` calls in flight (semaphore)
+    - `requests_per_minute` token bucket, so bursts stay under quota
+    - per-call `timeout`: the caller stops waiting even if the call hangs
+    - up to `max_retries` retries with jittered exponential backoff
+    - optional hedging: when a call is still running after the observed p95
+      latency, a second identical request is sent if a slot and a token are
+      free, and whichever finishes first wins
+
+    The model object (and its HTTP/gRPC channel) is created once and reused.
+    """
+
+    def __init__(self, model, max_concurrency=4, requests_per_minute=60, timeout=30.0,
+                 max_retries=3, backoff_base=1.0, backoff_max=20.0,
+                 hedge=False, hedge_delay=2.0, hedge_min_samples=20):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(requests_per_minute)
+        # Two threads per slot so a hedge never waits for an executor thread
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix='gemini')
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.counters = {
+            'calls': 0,
+            'errors': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'busy': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def p95_latency(self):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        p95 = self.p95_latency()
+        stats['p95_latency_seconds'] = round(p95, 4) if p95 is not None else None
+        return stats
+
+    def _call(self, prompt, generation_config=None):
+        """Runs on an executor thread; the caller already holds a slot and a token"""
+        started = time.monotonic()
+        try:
+            # Retries are ours (jittered, counted), so the library's own retry is disabled
+            with stage('gemini_generate'):
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={'timeout': self.timeout, 'retry': None}
+                )
+            text = response.text
+            with self._lock:
+                self._latencies.append(time.monotonic() - started)
+            return text
+        finally:
+            self._slots.release()
+
+    def _submit(self, prompt, generation_config, block_until):
+        """Take a concurrency slot and a rate limit token, then start the call"""
+        if block_until is None:
+            if not self._slots.acquire(blocking=False):
+                return None
+            if not self._bucket.try_acquire():
+                self._slots.release()
+                return None
+        else:
+            if not self._slots.acquire(timeout=max(0.0, block_until - time.monotonic())):
+                self._count('busy')
+                raise GeminiBusyError('No Gemini concurrency slot available')
+            if not self._bucket.acquire(max(0.0, block_until - time.monotonic())):
+                self._slots.release()
+                self._count('busy')
+                raise GeminiBusyError('Gemini rate limit reached')
+        self._count('calls')
+        return self._executor.submit(self._call, prompt, generation_config)
+
+    def _attempt(self, prompt, generation_config=None):
+        """One attempt, possibly hedged. Returns the text or raises"""
+        deadline = time.monotonic() + self.timeout
+        primary = self._submit(prompt, generation_config, block_until=deadline)
+        pending = {primary}
+
+        if self.hedge:
+            delay = self.p95_latency() or self.hedge_delay
+            done, _ = wait(pending, timeout=min(delay, max(0.0, deadline - time.monotonic())))
+            if not done:
+                hedged = self._submit(prompt, generation_config, block_until=None)
+                if hedged is not None:
+                    self._count('hedges')
+                    pending.add(hedged)
+
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is not primary:
+                    self._count('hedge_wins')
+                return text
+
+        if error is not None and not pending:
+            raise error
+        self._count('timeouts')
+        raise TimeoutError(f'Gemini call exceeded {self.timeout}s')
+
+    def generate(self, prompt, generation_config=None):
+        """Generated text for `prompt`, retried with jittered backoff on failure"""
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(prompt, generation_config)
+            except Exception as e:
+                self._count('errors')
+                if attempt >= self.max_retries or isinstance(e, GeminiBusyError):
+                    raise
+                attempt += 1
+                self._count('retries')
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay = random.uniform(0, delay)  # full jitter
+                logger.warning(f"Gemini call failed ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
@@ -0,0 +1,122 @@
+"""
+Local stand-in for the Gemini REST API (generateContent only).
+
+Run it and point the backend at it:
+    python gemini_stub_server.py --port 8765 --latency-ms 300 --fail-rate 0.1
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 python app.py
+
+Every request answers with canned bullet points after the configured latency
+(plus jitter); `--fail-rate` of the requests get a 503 instead.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+
+DEFAULT_TEXT = "- Kualitas produk sesuai deskripsi\n- Pengiriman cepat\n- Harga sepadan"
+
+
+class StubState:
+    def __init__(self, latency_ms=200, jitter_ms=50, fail_rate=0.0, text=DEFAULT_TEXT):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.text = text
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def _embedded_reviews(prompt):
+    """Reviews of a batched prompt: the first line holding a JSON list of {"id", "review"}"""
+    for line in prompt.splitlines():
+        if not line.startswith('[{'):
+            continue
+        try:
+            return [review for review in json.loads(line) if 'id' in review]
+        except ValueError:
+            continue
+    return []
+
+
+def make_handler(state):
+    class GeminiStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            with state.lock:
+                state.requests += 1
+
+            delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+            time.sleep(max(0.0, delay) / 1000.0)
+
+            if not self.path.split('?')[0].endswith(':generateContent'):
+                self._reply(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+                return
+            if random.random() < state.fail_rate:
+                self._reply(503, {'error': {'code': 503, 'message': 'Stub overloaded', 'status': 'UNAVAILABLE'}})
+                return
+
+            text = state.text
+            prompt = ''.join(
+                part.get('text', '')
+                for content in request.get('contents', [])
+                for part in content.get('parts', [])
+            )
+            if request.get('generationConfig', {}).get('responseMimeType') == 'application/json':
+                # Batched prompt: answer every review id found in the embedded JSON list
+                text = json.dumps([
+                    {'id': review['id'], 'key_points': [line.lstrip('- ') for line in state.text.splitlines()]}
+                    for review in _embedded_reviews(prompt)
+                ])
+            self._reply(200, {
+                'candidates': [{
+                    'content': {'parts': [{'text': text}], 'role': 'model'},
+                    'finishReason': 'STOP',
+                    'index': 0
+                }],
+                'usageMetadata': {
+                    'promptTokenCount': len(prompt.split()),
+                    'candidatesTokenCount': len(text.split()),
+                    'totalTokenCount': len(prompt.split()) + len(text.split())
+                }
+            })
+
+    return GeminiStubHandler
+
+
+def start_stub_server(host='127.0.0.1', port=0, **options):
+    """Start the stub in a daemon thread; returns (server, base_url)"""
+    state = StubState(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, name='gemini-stub', daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Gemini generateContent stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    state = StubState(args.latency_ms, args.jitter_ms, args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Gemini stub listening on http://{args.host}:{args.port}")
+    server.serve_forever()
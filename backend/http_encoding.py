@@ -0,0 +1,137 @@
+"""
+Response encoding: a faster JSON renderer, gzip/brotli compression and
+conditional GET helpers.
+
+- The 'json' renderer serializes with orjson when it is installed and with
+  compact json.dumps otherwise
+- Responses of at least COMPRESSION_MIN_BYTES are compressed with brotli
+  (when the `brotli` package is installed) or gzip, whichever the client
+  accepts; streamed bodies are compressed chunk by chunk
+- `not_modified()` / `set_validators()` let a view answer 304 from cheap
+  validators before it loads any rows
+"""
+from email.utils import format_datetime
+from datetime import timezone
+import json
+import os
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def dumps(value, default=None, **kw):
+    """Serializer for pyramid.renderers.JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, default=default)
+    return json.dumps(value, default=default, separators=(',', ':'), ensure_ascii=False)
+
+
+def accepted_encoding(request):
+    accepted = set()
+    for item in (request.headers.get('Accept-Encoding') or '').split(','):
+        name, _, params = item.partition(';')
+        try:
+            quality = float(params.strip()[2:]) if params.strip().startswith('q=') else 1.0
+        except ValueError:
+            quality = 1.0
+        if name.strip() and quality > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(app_iter, encoding):
+    compress, finish = _compressor(encoding)
+    try:
+        for chunk in app_iter:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(app_iter, 'close', None)
+        if close is not None:
+            close()
+
+
+def compression_tween_factory(handler, registry):
+    def compression_tween(request):
+        response = handler(request)
+        if request.method == 'HEAD' or response.status_code in (204, 304) or response.content_encoding:
+            return response
+        if not (response.content_type or '').startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary = tuple(response.vary or ()) + ('Accept-Encoding',)
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        if isinstance(response.app_iter, list):
+            body = response.body
+            if len(body) < COMPRESSION_MIN_BYTES:
+                return response
+            compress, finish = _compressor(encoding)
+            response.body = compress(body) + finish()
+        else:
+            # Streaming body (e.g. the export): compress as it is produced
+            response.app_iter = _compress_stream(response.app_iter, encoding)
+            response.content_length = None
+        response.content_encoding = encoding
+        return response
+    return compression_tween
+
+
+def _etag_values(header):
+    return [value.strip().replace('W/', '', 1).strip('"') for value in (header or '').split(',') if value.strip()]
+
+
+def not_modified(request, etag, last_modified=None):
+    """True when the client's If-None-Match / If-Modified-Since still match"""
+    if request.headers.get('If-None-Match'):
+        values = _etag_values(request.headers['If-None-Match'])
+        return '*' in values or etag in values
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    # Weak: the compressed and plain representations share one tag
+    response.headers['ETag'] = f'W/"{etag}"'
+    if last_modified is not None:
+        response.headers['Last-Modified'] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    response.headers['Cache-Control'] = 'no-cache'
+
+
+def includeme(config):
+    from pyramid.renderers import JSON
+    config.add_renderer('json', JSON(serializer=dumps))
+    if RESPONSE_COMPRESSION:
+        config.add_tween('http_encoding.compression_tween_factory')
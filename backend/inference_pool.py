@@ -0,0 +1,164 @@
+import logging
+import math
+import multiprocessing
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Model name the forkserver loads when it imports this module ('' for the
+# multilingual default)
+_PRELOAD_ENV = 'SENTIMENT_POOL_PRELOAD'
+
+# Analyzers loaded in the forkserver, by model name; the workers fork from it
+# and share their weights
+_preloaded = {}
+# The analyzer of this worker process, set by _init_worker
+_worker_analyzer = None
+_forkserver_started = False
+
+
+def _load(model_name):
+    from sentiment_analyzer import SentimentAnalyzer
+    analyzer = SentimentAnalyzer(model_name=model_name or None)
+    _share_weights(analyzer)
+    return analyzer
+
+
+def _preload():
+    """Load the pool's model in the forkserver process, before any worker forks"""
+    model_name = os.environ[_PRELOAD_ENV]
+    try:
+        _preloaded[model_name] = _load(model_name)
+    except Exception as e:
+        # The workers load it themselves then
+        logger.error(f"Could not preload {model_name} in the forkserver: {e}")
+
+
+def _init_worker(model_name, torch_threads):
+    global _worker_analyzer
+    # Never reuse pooled database connections of the process we forked from
+    models = sys.modules.get('models')
+    if models is not None:
+        models.engine.dispose(close=False)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_analyzer = _preloaded.get(model_name) or _load(model_name)
+
+
+def _timed(func, *args):
+    """(result, stage timings) of one call; the parent records the timings"""
+    import metrics
+    metrics._local.timings = []
+    try:
+        return func(*args), metrics._local.timings
+    finally:
+        metrics._local.timings = None
+
+
+def _describe():
+    analyzer = _worker_analyzer
+    return analyzer.model_name, analyzer.model_id, analyzer.batch_size
+
+
+def _analyze(text):
+    return _timed(_worker_analyzer.analyze, text)
+
+
+def _analyze_batch(texts):
+    return _timed(_worker_analyzer.analyze_batch, texts)
+
+
+def _share_weights(analyzer):
+    """Move torch weights to shared memory so workers never copy them on write"""
+    model = getattr(getattr(analyzer, 'analyzer', None), 'model', None)
+    if model is not None and hasattr(model, 'share_memory'):
+        model.share_memory()
+
+
+def _start_forkserver(model_name):
+    """
+    Start the forkserver with `model_name` preloaded. The forkserver is one per
+    server process and starts with the first pool, so pools created after it
+    (other language models) load their model in each worker instead
+    """
+    global _forkserver_started
+    if _forkserver_started:
+        return
+    from multiprocessing import forkserver
+    os.environ[_PRELOAD_ENV] = model_name or ''
+    multiprocessing.set_forkserver_preload(['__main__', __name__])
+    forkserver.ensure_running()
+    # The forkserver has its copy; nothing else started from here may preload
+    del os.environ[_PRELOAD_ENV]
+    _forkserver_started = True
+
+
+class ProcessPoolSentimentAnalyzer:
+    """
+    Runs SentimentAnalyzer.analyze()/analyze_batch() for `model_name` (None:
+    the multilingual model) in `num_workers` processes, side-stepping the GIL.
+    The model is never loaded in this process: the workers are forked from a
+    forkserver that loaded it once, so they share its weights instead of
+    loading N copies, and never inherit the server's threads, locks or sockets
+    no matter when the pool is created. Each worker uses `torch_threads`
+    intra-op threads. Stage timings measured in a worker are recorded in this
+    process's metrics (not in Server-Timing, the call does not run on the
+    request thread). Requires the forkserver start method (Linux/macOS).
+    """
+
+    def __init__(self, model_name, num_workers, torch_threads=None):
+        self.num_workers = num_workers
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // num_workers)
+        key = model_name or ''
+
+        _start_forkserver(key)
+        context = multiprocessing.get_context('forkserver')
+        self._pool = context.Pool(
+            processes=num_workers,
+            initializer=_init_worker,
+            initargs=(key, self.torch_threads)
+        )
+        # Resolved by a worker: fallback model, backend and long text mode
+        self.model_name, self.model_id, self.batch_size = self._pool.apply(_describe)
+        logger.info(
+            f"Sentiment process pool for {self.model_name} started with {num_workers} workers, "
+            f"{self.torch_threads} torch threads each"
+        )
+
+    @staticmethod
+    def _record(timings):
+        import metrics
+        if metrics.ENABLED:
+            for name, elapsed in timings:
+                metrics.STAGE_LATENCY.observe(elapsed, name)
+
+    def analyze(self, text):
+        result, timings = self._pool.apply(_analyze, (text,))
+        self._record(timings)
+        return result
+
+    def analyze_batch(self, texts, batch_size=None):
+        """Split the batch evenly over the workers, results keep input order"""
+        if not texts:
+            return []
+        chunk_size = max(1, math.ceil(len(texts) / self.num_workers))
+        if batch_size:
+            chunk_size = min(chunk_size, batch_size)
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        results = []
+        for chunk_results, timings in self._pool.map(_analyze_batch, chunks):
+            self._record(timings)
+            results.extend(chunk_results)
+        return results
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+
+if _PRELOAD_ENV in os.environ and multiprocessing.parent_process() is None and __name__ != '__main__':
+    _preload()
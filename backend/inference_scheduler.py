@@ -0,0 +1,125 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest:
+    """One analyze() call waiting for its batch to run"""
+
+    def __init__(self, text):
+        self.text = text
+        self.result = None
+        self.done = threading.Event()
+
+
+class InferenceScheduler:
+    """
+    Coalesces concurrent analyze() calls into one batched forward pass.
+
+    Request threads put their text on a queue and wait. A single worker thread
+    takes the first waiting text, keeps collecting more for up to `max_wait_ms`
+    (or until `max_batch_size` is reached), runs them with
+    `analyzer.analyze_batch` and wakes every caller with its own result.
+    `num_workers` > 1 keeps several batches in flight, which is useful when the
+    analyzer is a process pool. Exposes the same analyze()/analyze_batch() API
+    as SentimentAnalyzer.
+    """
+
+    def __init__(self, analyzer, max_batch_size=16, max_wait_ms=5, num_workers=1):
+        self.analyzer = analyzer
+        self.model_name = getattr(analyzer, 'model_name', None)
+        self.model_id = getattr(analyzer, 'model_id', self.model_name)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_queue_depth = 0
+        # Batch size histogram with power-of-two upper bounds: {1: n, 2: n, 4: n, ...}
+        self._histogram = {}
+        bound = 1
+        while bound < self.max_batch_size:
+            self._histogram[bound] = 0
+            bound *= 2
+        self._histogram[self.max_batch_size] = 0
+
+        self._workers = []
+        for number in range(max(1, int(num_workers))):
+            worker = threading.Thread(target=self._run, name=f'inference-scheduler-{number}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(
+            f"Inference scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={max_wait_ms}, workers={len(self._workers)})"
+        )
+
+    def analyze(self, text):
+        """Queue one text and block until its batch has been analyzed"""
+        pending = _PendingRequest(text)
+        self._queue.put(pending)
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        pending.done.wait()
+
+        if pending.result is None:
+            # Same fallback SentimentAnalyzer.analyze() uses on errors
+            return {'sentiment': 'neutral', 'confidence_score': 0.5, 'error': True}
+        return pending.result
+
+    def analyze_batch(self, texts, batch_size=None):
+        """Callers that already batch (bulk endpoint) go straight to the analyzer"""
+        return self.analyzer.analyze_batch(texts, batch_size=batch_size)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'requests': self._requests,
+                'batches': self._batches,
+                'avg_batch_size': round(self._requests / self._batches, 2) if self._batches else 0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batch_size_histogram': {f'<={bound}': count for bound, count in self._histogram.items()},
+            }
+
+    def _collect(self):
+        """Wait for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.analyzer.analyze_batch([pending.text for pending in batch])
+            except Exception as e:
+                logger.error(f"Batched inference failed: {e}", exc_info=True)
+                results = [None] * len(batch)
+
+            for pending, result in zip(batch, results):
+                pending.result = result
+                pending.done.set()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                for bound in self._histogram:
+                    if len(batch) <= bound:
+                        self._histogram[bound] += 1
+                        break
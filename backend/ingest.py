@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""
+Bulk import of review files (CSV or JSON Lines) without going through the API.
+
+    python ingest.py reviews.csv
+    python ingest.py reviews.jsonl --batch-size 1000 --key-points
+    python ingest.py reviews.csv --restart      # ignore the saved checkpoint
+
+Every record needs `review_text`; `product_name` and `language` are optional
+(same validation as POST /api/analyze-review, invalid records are logged and
+counted as skipped). The file is read as a stream, sentiment runs on whole
+batches and each batch is written with bulk inserts in one transaction
+together with its rollups, its key points jobs (--key-points, processed by the
+job workers of the running app) and the checkpoint. After a crash the same
+command continues after the last committed batch.
+"""
+from datetime import datetime
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+logger = logging.getLogger('ingest')
+
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+def iter_records(path, fmt, start_offset=0):
+    """
+    Yield (record, byte offset just past the record) from `path`, starting at
+    `start_offset`. Offsets always point at a record boundary, so they can be
+    stored as checkpoints and passed back in to resume.
+    """
+    with open(path, 'rb') as f:
+        position = 0
+        header = None
+        if fmt == 'csv':
+            first = f.readline()
+            position = len(first)
+            header = next(csv.reader([first.decode('utf-8-sig')]))
+        if start_offset > position:
+            f.seek(start_offset)
+            position = start_offset
+
+        def lines():
+            nonlocal position
+            for raw in f:
+                position += len(raw)
+                yield raw.decode('utf-8', errors='replace')
+
+        if fmt == 'csv':
+            # csv.reader pulls lines one at a time, so `position` is the end of
+            # the record it just returned, even for quoted multi-line fields
+            for row in csv.reader(lines()):
+                if not row:
+                    continue
+                yield dict(zip(header, row)), position
+            return
+
+        for line in lines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping invalid JSON line ending at byte {position}")
+                record = None
+            yield record, position
+
+
+class Ingestor:
+    def __init__(self, path, fmt=None, batch_size=500, key_points=False, max_attempts=5):
+        self.path = os.path.abspath(path)
+        self.fmt = fmt or detect_format(path)
+        self.batch_size = batch_size
+        self.key_points = key_points
+        self.max_attempts = max_attempts
+        self.analyzer = None
+
+    def _load_checkpoint(self, session, restart):
+        from models import IngestCheckpoint
+        checkpoint = session.get(IngestCheckpoint, self.path)
+        if checkpoint is None:
+            checkpoint = IngestCheckpoint(source=self.path)
+            session.add(checkpoint)
+        elif restart or checkpoint.byte_offset > os.path.getsize(self.path):
+            # Forced, or the file was replaced by a shorter one
+            checkpoint.byte_offset = 0
+            checkpoint.rows_read = 0
+            checkpoint.rows_inserted = 0
+            checkpoint.rows_skipped = 0
+            checkpoint.status = 'running'
+        session.commit()
+        return checkpoint
+
+    def _write_batch(self, session, checkpoint, batch, read, skipped, offset):
+        """Sentiment for `batch`, then reviews + rollups + jobs + checkpoint in one commit"""
+        from dedup import DEDUP_ENABLED, index_reviews
+        from models import AnalysisJob, Review, bump_version
+        from sentiment_stats import record_reviews
+
+        rows = []
+        if batch:
+            sentiments = self.analyzer.analyze_batch([fields['review_text'] for fields in batch])
+            now = datetime.utcnow()
+            for fields, sentiment in zip(batch, sentiments):
+                if sentiment is None:
+                    skipped += 1
+                    continue
+                rows.append(dict(
+                    fields,
+                    sentiment=sentiment['sentiment'],
+                    confidence_score=sentiment['confidence_score'],
+                    sentiment_tier=sentiment.get('tier'),
+                    key_points=None,
+                    created_at=now
+                ))
+
+        if rows:
+            # Primary keys are only needed for the key points jobs and the duplicate index
+            session.bulk_insert_mappings(Review, rows, return_defaults=self.key_points or DEDUP_ENABLED)
+            record_reviews(session, [SimpleNamespace(**row) for row in rows])
+            bump_version(session)
+            if DEDUP_ENABLED:
+                index_reviews(session, [(row['id'], row['review_text']) for row in rows])
+            if self.key_points:
+                session.bulk_insert_mappings(AnalysisJob, [
+                    {
+                        'review_id': row['id'],
+                        'status': 'pending',
+                        'max_attempts': self.max_attempts,
+                        'next_run_at': row['created_at'],
+                        'created_at': row['created_at'],
+                        'updated_at': row['created_at'],
+                    }
+                    for row in rows
+                ])
+
+        checkpoint.byte_offset = offset
+        checkpoint.rows_read += read
+        checkpoint.rows_inserted += len(rows)
+        checkpoint.rows_skipped += skipped
+        checkpoint.updated_at = datetime.utcnow()
+        session.commit()
+        return len(rows)
+
+    def run(self, restart=False):
+        from language_router import build_sentiment_analyzer
+        from models import Session
+
+        session = Session()
+        try:
+            checkpoint = self._load_checkpoint(session, restart)
+            if checkpoint.status == 'done':
+                logger.info(f"{self.path} was already imported ({checkpoint.rows_inserted} rows); use --restart to import it again")
+                return checkpoint
+
+            if checkpoint.byte_offset:
+                logger.info(f"Resuming {self.path} at byte {checkpoint.byte_offset} ({checkpoint.rows_inserted} rows already imported)")
+            self.analyzer = build_sentiment_analyzer()
+
+            from views import parse_review_input
+            started = time.monotonic()
+            inserted = 0
+            batch, read, skipped, offset = [], 0, 0, checkpoint.byte_offset
+            for record, offset in iter_records(self.path, self.fmt, checkpoint.byte_offset):
+                read += 1
+                fields, error = parse_review_input(record)
+                if error:
+                    # Counted and passed by the checkpoint, so a resume never retries it
+                    logger.warning(f"Skipping record ending at byte {offset}: {error}")
+                    skipped += 1
+                else:
+                    batch.append(fields)
+                if len(batch) >= self.batch_size:
+                    inserted += self._write_batch(session, checkpoint, batch, read, skipped, offset)
+                    batch, read, skipped = [], 0, 0
+                    elapsed = time.monotonic() - started
+                    logger.info(f"{checkpoint.rows_inserted} rows imported, {inserted / elapsed:.1f} rows/s")
+
+            inserted += self._write_batch(session, checkpoint, batch, read, skipped, offset)
+            checkpoint.status = 'done'
+            session.commit()
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Finished {self.path}: {inserted} rows imported in {elapsed:.1f}s "
+                f"({inserted / elapsed if elapsed else 0:.1f} rows/s), "
+                f"{checkpoint.rows_skipped} skipped in total"
+            )
+            return checkpoint
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Bulk import reviews from a CSV or JSONL file')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension')
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('INGEST_BATCH_SIZE', '500')))
+    parser.add_argument('--key-points', action='store_true', help='queue key points extraction for every row')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the top')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"File not found: {args.path}")
+        sys.exit(1)
+
+    from models import migrate
+    migrate()
+    Ingestor(
+        args.path,
+        fmt=args.format,
+        batch_size=args.batch_size,
+        key_points=args.key_points,
+        max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+    ).run(restart=args.restart)
@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+import logging
+import random
+import threading
+import time
+
+from sqlalchemy import or_, update
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_key_points(session, review, max_attempts=5):
+    """
+    Add a key points job for `review` to `session`. It is committed together
+    with the review, so a saved review always has its job.
+    """
+    from models import AnalysisJob
+    job = AnalysisJob(review=review, status='pending', max_attempts=max_attempts)
+    session.add(job)
+    return job
+
+
+class JobWorkerPool:
+    """
+    Background threads draining the analysis_jobs table.
+
+    Each worker claims one due job with a conditional UPDATE (works the same
+    on SQLite and Postgres, no broker needed), runs `handler(review)` to get
+    the key points and stores them on the review. Failed jobs are retried with
+    exponential backoff plus jitter until max_attempts, then marked failed and
+    `on_give_up(review)` fills in placeholder key points. Jobs left `running`
+    by a crashed process are picked up again after `stale_after` seconds.
+    `on_done(session, review)` runs in the transaction that stores real key
+    points, for data derived from them. `maintenance()`, when given, is run by
+    the first worker every `maintenance_interval` seconds (housekeeping such
+    as creating the next review partitions).
+    """
+
+    def __init__(self, handler, on_give_up=None, num_workers=2, poll_interval=1.0,
+                 backoff_base=2.0, backoff_max=300.0, stale_after=600.0, on_done=None,
+                 maintenance=None, maintenance_interval=3600.0):
+        self.handler = handler
+        self.on_give_up = on_give_up
+        self.on_done = on_done
+        self.maintenance = maintenance
+        self.maintenance_interval = maintenance_interval
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stale_after = stale_after
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for number in range(self.num_workers):
+            thread = threading.Thread(target=self._run, args=(number == 0,), name=f'job-worker-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job worker pool started with {self.num_workers} workers")
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers right away after a new job was committed"""
+        self._wakeup.set()
+
+    def backoff_delay(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _run(self, runs_maintenance=False):
+        next_maintenance = time.monotonic() + self.maintenance_interval
+        while not self._stop.is_set():
+            if runs_maintenance and self.maintenance and time.monotonic() >= next_maintenance:
+                next_maintenance = time.monotonic() + self.maintenance_interval
+                try:
+                    self.maintenance()
+                except Exception as e:
+                    logger.error(f"Job worker maintenance error: {e}", exc_info=True)
+            try:
+                worked = self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}", exc_info=True)
+                worked = False
+            if not worked:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def run_once(self):
+        """Claim and process one due job. Returns False when nothing was due"""
+        from models import Session, AnalysisJob, bump_version
+        session = Session()
+        try:
+            job_id = self._claim(session, AnalysisJob)
+            if job_id is None:
+                return False
+
+            job = session.get(AnalysisJob, job_id)
+            review = job.review
+            # Do not hold a transaction open during the slow remote call
+            if review is not None:
+                session.expunge(review)
+            session.commit()
+
+            try:
+                if review is None:
+                    raise RuntimeError('Review no longer exists')
+                key_points = self.handler(review)
+                job.review.key_points = key_points
+                bump_version(session)
+                if self.on_done:
+                    self.on_done(session, job.review)
+                job.status = 'done'
+                job.last_error = None
+                logger.info(f"Job {job.id} done for review {job.review_id}")
+            except Exception as e:
+                job.last_error = str(e)[:1000]
+                if job.attempts >= job.max_attempts:
+                    job.status = 'failed'
+                    if review is not None and self.on_give_up:
+                        job.review.key_points = self.on_give_up(review)
+                        bump_version(session)
+                    logger.error(f"Job {job.id} failed after {job.attempts} attempts: {e}")
+                else:
+                    job.status = 'pending'
+                    job.next_run_at = datetime.utcnow() + timedelta(seconds=self.backoff_delay(job.attempts))
+                    logger.warning(f"Job {job.id} attempt {job.attempts} failed, retrying at {job.next_run_at}: {e}")
+            job.locked_at = None
+            job.updated_at = datetime.utcnow()
+            session.commit()
+            return True
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _claim(self, session, AnalysisJob):
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.stale_after)
+        due = or_(
+            (AnalysisJob.status == 'pending') & (AnalysisJob.next_run_at <= now),
+            (AnalysisJob.status == 'running') & (AnalysisJob.locked_at < stale),
+        )
+        candidates = (
+            session.query(AnalysisJob.id)
+            .filter(due)
+            .order_by(AnalysisJob.next_run_at, AnalysisJob.id)
+            .limit(self.num_workers)
+            .all()
+        )
+        for (job_id,) in candidates:
+            # Re-checking `due` inside the UPDATE makes the claim atomic between workers
+            claimed = session.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, due)
+                .values(
+                    status='running',
+                    locked_at=now,
+                    updated_at=now,
+                    attempts=AnalysisJob.attempts + 1
+                )
+            )
+            session.commit()
+            if claimed.rowcount == 1:
+                return job_id
+        return None
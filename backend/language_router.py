@@ -0,0 +1,94 @@
+import logging
+import os
+
+from language_id import MIN_CONFIDENCE, detect
+
+logger = logging.getLogger(__name__)
+
+# Language-specific sentiment models (Hugging Face ids); empty means the
+# multilingual model handles that language too
+LANGUAGE_MODELS = {
+    'id': os.getenv('SENTIMENT_MODEL_ID', ''),
+    'en': os.getenv('SENTIMENT_MODEL_EN', ''),
+}
+
+
+class LanguageRouter:
+    """
+    Sends each text to the sentiment analyzer of its detected language.
+
+    `routes` maps a language ('id', 'en') to an analyzer with the
+    analyze()/analyze_batch() API; texts in other languages, or detected with
+    less than `min_confidence`, go to `default` (the multilingual model).
+    analyze_batch groups the texts per analyzer, so each model still sees
+    padded batches. Anything else (stats(), ...) is the default analyzer's.
+    """
+
+    def __init__(self, default, routes, min_confidence=MIN_CONFIDENCE):
+        self.default = default
+        self.routes = dict(routes)
+        self.min_confidence = min_confidence
+        self.model_name = getattr(default, 'model_name', None)
+        # One cache namespace per routing setup
+        self.model_id = '|'.join(
+            [str(getattr(default, 'model_id', self.model_name))] +
+            [f"{language}={getattr(analyzer, 'model_id', None)}" for language, analyzer in sorted(self.routes.items())]
+        )
+        logger.info(f"Language routing enabled for: {', '.join(sorted(self.routes))}")
+
+    def __getattr__(self, name):
+        if name == 'default':
+            raise AttributeError(name)
+        return getattr(self.default, name)
+
+    def route(self, text):
+        language, confidence = detect(text)
+        if language in self.routes and confidence >= self.min_confidence:
+            return language
+        return None
+
+    def analyzer_for(self, route):
+        return self.routes[route] if route is not None else self.default
+
+    def analyze(self, text):
+        return self.analyzer_for(self.route(text)).analyze(text)
+
+    def analyze_batch(self, texts, batch_size=None):
+        if not texts:
+            return []
+        groups = {}
+        for index, text in enumerate(texts):
+            groups.setdefault(self.route(text), []).append(index)
+
+        results = [None] * len(texts)
+        for route, indexes in groups.items():
+            analyzer = self.analyzer_for(route)
+            outputs = analyzer.analyze_batch([texts[i] for i in indexes], batch_size=batch_size)
+            for index, output in zip(indexes, outputs):
+                results[index] = output
+        return results
+
+
+def build_sentiment_analyzer(load=None):
+    """
+    The multilingual SentimentAnalyzer, behind a LanguageRouter when language
+    models are configured and behind the lexicon cascade when enabled.
+    `load(model_name=None)` builds each underlying analyzer (views uses it for
+    the process pool and inference scheduler)
+    """
+    from sentiment_analyzer import SentimentAnalyzer
+    from sentiment_cascade import SENTIMENT_CASCADE, CascadeAnalyzer
+
+    load = load or (lambda model_name=None: SentimentAnalyzer(model_name=model_name))
+    default = load()
+    routes = {}
+    for language, model_name in LANGUAGE_MODELS.items():
+        if not model_name:
+            continue
+        try:
+            routes[language] = load(model_name)
+        except Exception as e:
+            logger.error(f"Could not load {language} sentiment model {model_name}, using the multilingual model: {e}")
+    analyzer = LanguageRouter(default, routes) if routes else default
+    # Outermost, so lexicon answers never wait in a scheduler queue
+    return CascadeAnalyzer(analyzer) if SENTIMENT_CASCADE else analyzer
@@ -0,0 +1,186 @@
+"""
+Lightweight instrumentation: counters, latency histograms and per-stage
+timers, rendered in the Prometheus text format on GET /metrics.
+
+    from metrics import stage
+    with stage('sentiment'):
+        ...
+
+With METRICS_ENABLED=false, stage() returns one shared no-op context manager
+and the request tween is not installed, so instrumented code pays a single
+attribute lookup. With SERVER_TIMING=true (or a request header
+`X-Server-Timing: 1`) responses carry a Server-Timing header listing the
+stages that ran on the request thread.
+"""
+from bisect import bisect_left
+import os
+import threading
+import time
+
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_local = threading.local()
+
+
+def _label_string(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_string(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((label_values, list(series)) for label_values, series in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                labels = _label_string(self.labels + ('le',), label_values + (bound,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _label_string(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency by route', ('route',))
+STAGE_LATENCY = Histogram('stage_duration_seconds', 'Time spent per pipeline stage', ('stage',))
+LANGUAGE_DETECTIONS = Counter('language_detections_total', 'Review languages detected locally', ('language',))
+SENTIMENT_TIERS = Counter('sentiment_tier_total', 'Sentiment results by cascade tier', ('tier',))
+_METRICS = [REQUESTS, REQUEST_LATENCY, STAGE_LATENCY, LANGUAGE_DETECTIONS, SENTIMENT_TIERS]
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        STAGE_LATENCY.observe(elapsed, self.name)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+
+def stage(name):
+    """Context manager timing one pipeline stage"""
+    if not ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def server_timing_header(timings, total):
+    entries = [f'{name.replace(" ", "_")};dur={elapsed * 1000:.1f}' for name, elapsed in timings]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def metrics_tween_factory(handler, registry):
+    def metrics_tween(request):
+        wants_timing = SERVER_TIMING or request.headers.get('X-Server-Timing') == '1'
+        _local.timings = [] if wants_timing else None
+        started = time.perf_counter()
+        response = None
+        status = 500
+        try:
+            response = handler(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            route = request.matched_route.name if request.matched_route else 'not_found'
+            REQUESTS.inc(route, request.method, status)
+            REQUEST_LATENCY.observe(elapsed, route)
+            if wants_timing and response is not None:
+                response.headers['Server-Timing'] = server_timing_header(_local.timings, elapsed)
+            _local.timings = None
+    return metrics_tween
+
+
+def render(gauges=None):
+    """Prometheus text exposition; `gauges` is {name: (help, value or {labels: value})}"""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for name, (help_text, value) in sorted((gauges or {}).items()):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        if isinstance(value, dict):
+            for label_values, labeled_value in sorted(value.items()):
+                label_name, label_value = label_values
+                lines.append(f'{name}{_label_string((label_name,), (label_value,))} {labeled_value}')
+        else:
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def includeme(config):
+    if ENABLED:
+        config.add_tween('metrics.metrics_tween_factory')
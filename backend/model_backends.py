@@ -0,0 +1,253 @@
+"""
+Inference backends for SentimentAnalyzer.
+
+- pytorch:       the plain fp32 transformers pipeline
+- pytorch-int8:  dynamic int8 quantization of the Linear layers
+- onnxruntime:   the model exported to ONNX and run with onnxruntime
+
+Converted models are written once to SENTIMENT_MODEL_CACHE_DIR and loaded
+from there on the next start. Every backend returns pipeline style output
+([{'label': ..., 'score': ...}]) with the model's own id2label labels, so the
+1-5 STARS mapping in SentimentAnalyzer stays the same.
+"""
+import logging
+import os
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('pytorch', 'pytorch-int8', 'onnxruntime')
+
+
+def _artifact_dir(cache_dir, model_name, backend):
+    path = os.path.join(cache_dir, model_name.replace('/', '--'), backend)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_pytorch(model_name, hf_token=None):
+    from transformers import pipeline
+    return pipeline(
+        "sentiment-analysis",
+        model=model_name,
+        token=hf_token,
+        device=-1  # Use CPU explicitly to avoid meta tensor issues
+    )
+
+
+def load_pytorch_int8(model_name, cache_dir, hf_token=None):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+
+    path = _artifact_dir(cache_dir, model_name, 'pytorch-int8')
+    artifact = os.path.join(path, 'model.pt')
+    tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token)
+
+    if os.path.exists(artifact):
+        model = torch.load(artifact, weights_only=False)
+        logger.info(f"Loaded int8 model from {artifact}")
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_name, token=hf_token)
+        model.eval()
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        tmp = artifact + '.tmp'
+        torch.save(model, tmp)
+        os.replace(tmp, artifact)
+        logger.info(f"Quantized {model_name} to int8 and cached it at {artifact}")
+
+    model.eval()
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device=-1)
+
+
+def export_onnx(model_name, path, hf_token=None):
+    """One-time export of the classifier to <path>/model.onnx plus tokenizer/config"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, token=hf_token)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, token=hf_token)
+    model.eval()
+
+    sample = tokenizer(["ekspor model sentimen"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    artifact = os.path.join(path, 'model.onnx')
+    tmp = artifact + '.tmp'
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            tmp,
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    tokenizer.save_pretrained(path)
+    model.config.save_pretrained(path)
+    os.replace(tmp, artifact)
+    logger.info(f"Exported {model_name} to {artifact}")
+
+
+class OnnxSentimentPipeline:
+    """Minimal stand-in for the transformers sentiment pipeline on onnxruntime"""
+
+    def __init__(self, path, max_length=512):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.id2label = AutoConfig.from_pretrained(path).id2label
+        self.max_length = max_length
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(path, 'model.onnx'),
+            providers=['CPUExecutionProvider']
+        )
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def probabilities(self, encoded):
+        """Softmax over the labels for an already tokenized, padded batch"""
+        import numpy as np
+
+        feed = {name: np.asarray(encoded[name]).astype(np.int64) for name in self.input_names}
+        with stage('model_forward'):
+            logits = self.session.run(['logits'], feed)[0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=-1, keepdims=True)
+        return probabilities
+
+    def __call__(self, inputs, batch_size=None, truncation=True, **kwargs):
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or 1
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            with stage('tokenize'):
+                encoded = self.tokenizer(
+                    texts[start:start + batch_size],
+                    padding=True,
+                    truncation=truncation,
+                    max_length=self.max_length,
+                    return_tensors='np'
+                )
+            for row in self.probabilities(encoded):
+                index = int(row.argmax())
+                outputs.append({'label': self.id2label[index], 'score': float(row[index])})
+        return outputs
+
+
+def predict(analyzer, texts, batch_size=16):
+    """
+    Pipeline style output for texts that fit in one window. On the pytorch
+    backends the tokenizer and the model are called directly, so tokenize and
+    model_forward are timed as separate stages like on onnxruntime
+    """
+    if isinstance(analyzer, OnnxSentimentPipeline):
+        return analyzer(texts, batch_size=batch_size, truncation=True)
+
+    import torch
+    tokenizer = analyzer.tokenizer
+    id2label = analyzer.model.config.id2label
+    max_length = min(512, tokenizer.model_max_length)
+    outputs = []
+    for start in range(0, len(texts), batch_size):
+        with stage('tokenize'):
+            encoded = tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors='pt'
+            )
+        with torch.no_grad(), stage('model_forward'):
+            logits = analyzer.model(**encoded).logits
+        for row in torch.softmax(logits, dim=-1):
+            index = int(row.argmax())
+            outputs.append({'label': id2label[index], 'score': float(row[index])})
+    return outputs
+
+
+def _window_probabilities(analyzer, batch):
+    """Label probabilities for one padded batch of token windows"""
+    if isinstance(analyzer, OnnxSentimentPipeline):
+        return analyzer.probabilities(analyzer.tokenizer.pad(batch, return_tensors='np'))
+
+    import torch
+    encoded = analyzer.tokenizer.pad(batch, return_tensors='pt')
+    with torch.no_grad(), stage('model_forward'):
+        logits = analyzer.model(**encoded).logits
+    return torch.softmax(logits, dim=-1).numpy()
+
+
+def chunked_predict(analyzer, texts, max_length=512, stride=128, batch_size=16):
+    """
+    Sentiment for texts longer than one model window, without truncating them.
+
+    All texts are tokenized once into overlapping windows of `max_length`
+    tokens (`stride` tokens shared between neighbouring windows), the windows
+    go through the model in padded batches of `batch_size`, and the label
+    probabilities of each text are averaged over its windows, weighted by the
+    number of tokens in each window. Returns pipeline style output, one
+    {'label', 'score'} per text.
+    """
+    import numpy as np
+
+    tokenizer = analyzer.tokenizer
+    max_length = min(max_length, tokenizer.model_max_length)
+    with stage('tokenize'):
+        encoded = tokenizer(
+            list(texts),
+            truncation=True,
+            max_length=max_length,
+            stride=stride,
+            return_overflowing_tokens=True
+        )
+    owners = encoded.pop('overflow_to_sample_mapping')
+    windows = [
+        {name: encoded[name][index] for name in encoded.keys()}
+        for index in range(len(owners))
+    ]
+
+    probabilities = np.concatenate([
+        _window_probabilities(analyzer, windows[start:start + batch_size])
+        for start in range(0, len(windows), batch_size)
+    ])
+    weights = np.array([len(window['input_ids']) for window in windows], dtype=np.float64)
+
+    if isinstance(analyzer, OnnxSentimentPipeline):
+        id2label = analyzer.id2label
+    else:
+        id2label = analyzer.model.config.id2label
+    totals = np.zeros((len(texts), probabilities.shape[1]))
+    window_weights = np.zeros(len(texts))
+    for owner, row, weight in zip(owners, probabilities, weights):
+        totals[owner] += row * weight
+        window_weights[owner] += weight
+
+    outputs = []
+    for row, weight in zip(totals, window_weights):
+        row = row / weight
+        index = int(row.argmax())
+        outputs.append({'label': id2label[index], 'score': float(row[index])})
+    return outputs
+
+
+def load_onnxruntime(model_name, cache_dir, hf_token=None):
+    path = _artifact_dir(cache_dir, model_name, 'onnxruntime')
+    if not os.path.exists(os.path.join(path, 'model.onnx')):
+        export_onnx(model_name, path, hf_token=hf_token)
+    else:
+        logger.info(f"Loaded ONNX model from {path}")
+    return OnnxSentimentPipeline(path)
+
+
+def load_backend(backend, model_name, cache_dir, hf_token=None):
+    """Return a pipeline-compatible callable for `model_name` on `backend`"""
+    if backend == 'pytorch-int8':
+        return load_pytorch_int8(model_name, cache_dir, hf_token=hf_token)
+    if backend == 'onnxruntime':
+        return load_onnxruntime(model_name, cache_dir, hf_token=hf_token)
+    return load_pytorch(model_name, hf_token=hf_token)
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Float, Index, ForeignKey, UniqueConstraint, LargeBinary
 from sqlalchemy import inspect, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
+import threading
+import time
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -20,8 +26,26 @@ class Review(Base):
     language = Column(String(10), nullable=True, default='id')
     sentiment = Column(String(50), nullable=False)
     confidence_score = Column(Float, nullable=False)
+    # Which tier of the sentiment cascade answered: 'lexicon' or 'model' (see sentiment_cascade.py)
+    sentiment_tier = Column(String(20), nullable=True)
     key_points = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every change (e.g. key points filled in by a job); validator for GET /api/reviews
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Set when the review is a near-duplicate whose analysis was copied (see dedup.py)
+    duplicate_of = Column(Integer, ForeignKey('reviews.id', ondelete='SET NULL'), nullable=True)
+
+    # Composite indexes backing keyset pagination on (created_at, id) with filters
+    __table_args__ = (
+        Index('ix_reviews_created_at_id', 'created_at', 'id'),
+        Index('ix_reviews_sentiment_created_at_id', 'sentiment', 'created_at', 'id'),
+        Index('ix_reviews_product_created_at_id', 'product_name', 'created_at', 'id'),
+        Index('ix_reviews_language_created_at_id', 'language', 'created_at', 'id'),
+    )
+
+    # Columns that can be requested with GET /api/reviews?fields=
+    FIELDS = ('id', 'product_name', 'language', 'review_text', 'sentiment',
+              'confidence_score', 'sentiment_tier', 'key_points', 'created_at', 'duplicate_of')
     
     def to_dict(self):
         return {
@@ -31,28 +55,313 @@ class Review(Base):
             'review_text': self.review_text,
             'sentiment': self.sentiment,
             'confidence_score': self.confidence_score,
+            'sentiment_tier': self.sentiment_tier,
             'key_points': self.key_points,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'duplicate_of': self.duplicate_of
+        }
+
+    @staticmethod
+    def row_to_dict(row, fields):
+        """Same format as to_dict() for a projected query row holding only `fields`"""
+        result = {}
+        for field in fields:
+            value = getattr(row, field)
+            if field == 'language':
+                value = value or 'id'
+            elif field == 'created_at':
+                value = value.isoformat() if value else None
+            result[field] = value
+        return result
+
+class AnalysisCache(Base):
+    """Persistent tier of result_cache.ResultCache"""
+    __tablename__ = 'analysis_cache'
+
+    key = Column(String(64), primary_key=True)
+    kind = Column(String(20), nullable=False)
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class AnalysisJob(Base):
+    """Queued key points extraction for a saved review (see job_queue.py)"""
+    __tablename__ = 'analysis_jobs'
+
+    id = Column(Integer, primary_key=True)
+    review_id = Column(Integer, ForeignKey('reviews.id', ondelete='CASCADE'), nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    last_error = Column(Text, nullable=True)
+    next_run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    review = relationship(Review)
+
+    __table_args__ = (
+        Index('ix_analysis_jobs_status_next_run_at', 'status', 'next_run_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'review_id': self.review_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class SentimentRollup(Base):
+    """Per day/product/language/sentiment counters (see sentiment_stats.py)"""
+    __tablename__ = 'sentiment_rollups'
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, nullable=False)
+    product_name = Column(String(255), nullable=False, default='')  # '' when the review has none
+    language = Column(String(10), nullable=False, default='id')
+    sentiment = Column(String(50), nullable=False)
+    review_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint('bucket', 'product_name', 'language', 'sentiment', name='uq_sentiment_rollups_key'),
+    )
+
+class ProductAspect(Base):
+    """Per product/aspect mention counters merged from key points (see product_summary.py)"""
+    __tablename__ = 'product_aspects'
+
+    id = Column(Integer, primary_key=True)
+    product_name = Column(String(255), nullable=False)
+    aspect = Column(String(100), nullable=False)
+    mentions = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    example = Column(String(255), nullable=True)  # first bullet seen for the aspect
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('product_name', 'aspect', name='uq_product_aspects_key'),
+    )
+
+class ReviewSignature(Base):
+    """MinHash signature of an indexed review (see dedup.py)"""
+    __tablename__ = 'review_signatures'
+
+    review_id = Column(Integer, ForeignKey('reviews.id', ondelete='CASCADE'), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class ReviewLshBucket(Base):
+    """One LSH band bucket of a review; reviews sharing a bucket are duplicate candidates"""
+    __tablename__ = 'review_lsh_buckets'
+
+    id = Column(Integer, primary_key=True)
+    bucket = Column(String(24), nullable=False, index=True)
+    review_id = Column(Integer, ForeignKey('reviews.id', ondelete='CASCADE'), nullable=False, index=True)
+
+class IngestCheckpoint(Base):
+    """Progress of a bulk file import (see ingest.py), committed with each batch"""
+    __tablename__ = 'ingest_checkpoints'
+
+    source = Column(String(1024), primary_key=True)  # absolute path of the imported file
+    byte_offset = Column(BigInteger, nullable=False, default=0)  # end of the last committed record
+    rows_read = Column(Integer, nullable=False, default=0)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    rows_skipped = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False, default='running')  # running, done
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DataVersion(Base):
+    """
+    Change counter of a table, bumped in every transaction that writes it, so
+    conditional GETs can be answered without scanning the table
+    """
+    __tablename__ = 'data_versions'
+
+    name = Column(String(50), primary_key=True)  # 'reviews'
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 # Database setup
 DATABASE_URL = os.getenv('DATABASE_URL')
-engine = create_engine(DATABASE_URL)
-Base.metadata.create_all(engine)
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+pool_metrics = {
+    'connects': 0,
+    'checkouts': 0,
+    'checkout_waits': 0,  # checkouts that found no idle connection in the pool
+    'wait_seconds_total': 0.0,
+    'timeouts': 0,
+}
+_pool_metrics_lock = threading.Lock()
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records checkout waits and timeouts in pool_metrics"""
+
+    def _do_get(self):
+        # A wait only happens when no connection is idle and no overflow
+        # connection may be opened (size() + overflow() at its cap)
+        waited = (
+            self.checkedin() == 0
+            and self._max_overflow > -1
+            and self.overflow() >= self._max_overflow
+        )
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with _pool_metrics_lock:
+                pool_metrics['timeouts'] += 1
+            raise
+        finally:
+            if waited:
+                with _pool_metrics_lock:
+                    pool_metrics['checkout_waits'] += 1
+                    pool_metrics['wait_seconds_total'] += time.monotonic() - started
+
+def _engine_options(database_url):
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory SQLite uses a single connection per thread, pool settings do not apply
+        return {}
+    return {
+        'poolclass': MeteredQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 Session = sessionmaker(bind=engine)
 
-# Ensure existing SQLite table has the new column if DB already exists
-try:
-    inspector = inspect(engine)
-    cols = [col['name'] for col in inspector.get_columns('reviews')]
-    if 'product_name' not in cols:
-        with engine.connect() as conn:
-            conn.execute(text('ALTER TABLE reviews ADD COLUMN product_name VARCHAR(255)'))
-            conn.commit()
-    if 'language' not in cols:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE reviews ADD COLUMN language VARCHAR(10)"))
+@event.listens_for(engine, 'connect')
+def _count_connect(dbapi_connection, connection_record):
+    with _pool_metrics_lock:
+        pool_metrics['connects'] += 1
+
+@event.listens_for(engine, 'checkout')
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _pool_metrics_lock:
+        pool_metrics['checkouts'] += 1
+
+def get_pool_stats():
+    """Live pool state plus the cumulative counters"""
+    with _pool_metrics_lock:
+        stats = dict(pool_metrics)
+    stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 4)
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': pool.overflow(),
+        })
+    return stats
+
+@contextmanager
+def session_scope():
+    """Session for code outside a request: commit on success, rollback on error, always close"""
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def bump_version(session, name='reviews'):
+    """Count one change of `name` in the caller's transaction"""
+    now = datetime.utcnow()
+    updated = session.query(DataVersion).filter(DataVersion.name == name).update(
+        {DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: now},
+        synchronize_session=False
+    )
+    if not updated:
+        # Normally seeded by migrate()
+        session.add(DataVersion(name=name, version=1, updated_at=now))
+        session.flush()
+
+def data_version(session, name='reviews'):
+    """(version, updated_at) of `name`; (0, None) before its first change"""
+    row = session.query(DataVersion.version, DataVersion.updated_at).filter(DataVersion.name == name).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+def migrate(bind=None):
+    """
+    Create missing tables/indexes and add columns introduced after the first release.
+    Runs on app startup (AUTO_MIGRATE) or explicitly with: python models.py migrate
+    """
+    bind = bind or engine
+    Base.metadata.create_all(bind)
+
+    # Ensure existing SQLite table has the new column if DB already exists
+    try:
+        inspector = inspect(bind)
+        cols = [col['name'] for col in inspector.get_columns('reviews')]
+        if 'product_name' not in cols:
+            with bind.connect() as conn:
+                conn.execute(text('ALTER TABLE reviews ADD COLUMN product_name VARCHAR(255)'))
+                conn.commit()
+        if 'language' not in cols:
+            with bind.connect() as conn:
+                conn.execute(text("ALTER TABLE reviews ADD COLUMN language VARCHAR(10)"))
+                conn.commit()
+        if 'updated_at' not in cols:
+            with bind.connect() as conn:
+                conn.execute(text("ALTER TABLE reviews ADD COLUMN updated_at TIMESTAMP"))
+                conn.commit()
+        if 'duplicate_of' not in cols:
+            with bind.connect() as conn:
+                conn.execute(text("ALTER TABLE reviews ADD COLUMN duplicate_of INTEGER REFERENCES reviews(id) ON DELETE SET NULL"))
+                conn.commit()
+        if 'sentiment_tier' not in cols:
+            with bind.connect() as conn:
+                conn.execute(text("ALTER TABLE reviews ADD COLUMN sentiment_tier VARCHAR(20)"))
+                conn.commit()
+        # create_all only builds indexes together with new tables
+        for index in Review.__table__.indexes:
+            index.create(bind, checkfirst=True)
+    except Exception:
+        # If anything goes wrong (e.g., table doesn't exist yet), ignore and let metadata.create_all handle it
+        pass
+
+    # Seed the change counter, so concurrent writers only ever UPDATE it
+    with bind.connect() as conn:
+        if conn.execute(text("SELECT 1 FROM data_versions WHERE name = 'reviews'")).first() is None:
+            conn.execute(text("INSERT INTO data_versions (name, version, updated_at) VALUES ('reviews', 0, :now)"),
+                         {'now': datetime.utcnow()})
             conn.commit()
-except Exception:
-    # If anything goes wrong (e.g., table doesn't exist yet), ignore and let metadata.create_all handle it
-    pass
\ No newline at end of file
+
+    # Full-text search index (tsvector + GIN on Postgres, FTS5 on SQLite)
+    import search_index
+    search_index.install(bind)
+
+    # Upcoming monthly partitions when reviews is partitioned (Postgres, see retention.py)
+    import retention
+    retention.ensure_partitions(bind)
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 2 or sys.argv[1] != 'migrate':
+        print("Usage: python models.py migrate")
+        sys.exit(1)
+    migrate()
+    print("Database migrated")
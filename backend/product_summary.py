@@ -0,0 +1,208 @@
+"""
+Per-product aspect summaries served by GET /api/products/{product_name}/summary.
+
+Each key points bullet of a review is mapped to an aspect (battery, delivery,
+price, ...) with a small Indonesian/English lexicon; bullets that match none
+use their first content word, so new aspects still show up. Every review with
+key points adds one mention per aspect, counted under the review's sentiment,
+to the product_aspects table, inside the transaction that stores the key
+points (on insert, or when an async job fills them in). The endpoint only
+reads those rows; nothing is re-read or re-prompted.
+
+Near-duplicates (reviews.duplicate_of) are not counted, so spam does not
+inflate an aspect.
+
+Rebuild from scratch (reviews archived by retention.py are not included) with:
+    python product_summary.py rebuild
+"""
+from datetime import datetime
+import logging
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+ASPECTS = {
+    'battery': ('baterai', 'batre', 'battery', 'charging', 'cas'),
+    'delivery': ('pengiriman', 'kirim', 'dikirim', 'kurir', 'ekspedisi', 'delivery', 'shipping', 'arrived'),
+    'packaging': ('kemasan', 'packing', 'packaging', 'bungkus', 'dus', 'bubble'),
+    'price': ('harga', 'murah', 'mahal', 'price', 'cheap', 'expensive', 'worth', 'value'),
+    'quality': ('kualitas', 'bahan', 'material', 'quality', 'build'),
+    'seller': ('penjual', 'seller', 'toko', 'pelayanan', 'service', 'respon', 'admin', 'cs'),
+    'accuracy': ('sesuai', 'deskripsi', 'gambar', 'original', 'ori', 'described', 'description', 'asli'),
+    'screen': ('layar', 'screen', 'display'),
+    'performance': ('performa', 'kinerja', 'lemot', 'lag', 'performance', 'speed', 'kencang'),
+    'camera': ('kamera', 'camera', 'foto', 'photo'),
+    'sound': ('suara', 'sound', 'audio', 'speaker', 'bass'),
+    'size': ('ukuran', 'size', 'fit', 'kebesaran', 'kekecilan'),
+}
+
+STOPWORDS = {
+    'yang', 'dan', 'dengan', 'sangat', 'sekali', 'cukup', 'agak', 'tidak', 'kurang', 'lebih',
+    'tapi', 'namun', 'untuk', 'dari', 'ini', 'itu', 'ada', 'sudah', 'belum', 'bisa', 'juga',
+    'the', 'and', 'with', 'very', 'is', 'are', 'was', 'not', 'but', 'for', 'of', 'to', 'a', 'an',
+    'good', 'bad', 'great', 'poor', 'bagus', 'jelek', 'baik', 'buruk', 'mantap', 'oke', 'ok',
+    'http', 'https', 'www',
+}
+
+# Placeholders written when Gemini fails; they say nothing about the product
+FALLBACK_BULLETS = {
+    'tidak bisa ekstrak poin penting saat ini',
+    'unable to extract key points at this time',
+}
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+
+# Longer "words" are URLs or run-together text, not an aspect
+MAX_ASPECT_LENGTH = 30
+
+_KEYWORDS = {keyword: aspect for aspect, keywords in ASPECTS.items() for keyword in keywords}
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def bullets(key_points):
+    for line in (key_points or '').splitlines():
+        line = line.strip().lstrip('-*•').strip()
+        if line and line.lower().rstrip('.') not in FALLBACK_BULLETS:
+            yield line
+
+
+def aspects_of(key_points):
+    """{aspect: first bullet mentioning it} for one review's key points"""
+    found = {}
+    for bullet in bullets(key_points):
+        words = _WORD.findall(bullet.lower())
+        matched = {_KEYWORDS[word] for word in words if word in _KEYWORDS}
+        if not matched:
+            content = [
+                word for word in words
+                if word not in STOPWORDS and 2 < len(word) <= MAX_ASPECT_LENGTH and not word.isdigit()
+            ]
+            matched = {content[0]} if content else set()
+        for aspect in matched:
+            found.setdefault(aspect, bullet[:255])
+    return found
+
+
+def _upsert(session, values):
+    """INSERT ... ON CONFLICT DO UPDATE adding to the counters (SQLite and Postgres)"""
+    from models import ProductAspect
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    if insert is None:
+        row = session.query(ProductAspect).filter_by(
+            product_name=values['product_name'],
+            aspect=values['aspect']
+        ).with_for_update().first()
+        if row is None:
+            session.add(ProductAspect(**values))
+        else:
+            for column in ('mentions',) + SENTIMENTS:
+                setattr(row, column, getattr(row, column) + values[column])
+            row.updated_at = values['updated_at']
+        return
+
+    statement = insert(ProductAspect).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=['product_name', 'aspect'],
+        set_=dict(
+            {column: getattr(ProductAspect, column) + getattr(statement.excluded, column)
+             for column in ('mentions',) + SENTIMENTS},
+            updated_at=statement.excluded.updated_at
+        )
+    )
+    session.execute(statement)
+
+
+def record_key_points(session, reviews):
+    """Add the aspects of reviews whose key points are final; call before the session commits"""
+    totals = {}
+    for review in reviews:
+        if not review.product_name or not review.key_points or getattr(review, 'duplicate_of', None):
+            continue
+        for aspect, example in aspects_of(review.key_points).items():
+            total = totals.get((review.product_name, aspect))
+            if total is None:
+                total = totals[(review.product_name, aspect)] = dict(
+                    {'mentions': 0, 'example': example}, **{sentiment: 0 for sentiment in SENTIMENTS}
+                )
+            total['mentions'] += 1
+            if review.sentiment in SENTIMENTS:
+                total[review.sentiment] += 1
+
+    now = datetime.utcnow()
+    for (product_name, aspect), total in totals.items():
+        _upsert(session, dict(total, product_name=product_name, aspect=aspect, updated_at=now))
+
+
+def summarize(session, product_name, limit=20):
+    """Aspects of one product ranked by mentions, plus the product's sentiment totals"""
+    from models import ProductAspect
+    from sentiment_stats import query_stats
+
+    rows = (
+        session.query(ProductAspect)
+        .filter(ProductAspect.product_name == product_name)
+        .order_by(ProductAspect.mentions.desc(), ProductAspect.aspect)
+        .limit(limit)
+        .all()
+    )
+    aspects = []
+    for row in rows:
+        aspects.append({
+            'aspect': row.aspect,
+            'mentions': row.mentions,
+            'sentiments': {sentiment: getattr(row, sentiment) for sentiment in SENTIMENTS},
+            # -1 (all negative) .. 1 (all positive)
+            'score': round((row.positive - row.negative) / row.mentions, 4) if row.mentions else 0.0,
+            'example': row.example,
+        })
+
+    updated_at = max((row.updated_at for row in rows if row.updated_at), default=None)
+    return {
+        'product_name': product_name,
+        'reviews': query_stats(session, product_name=product_name)['total'],
+        'aspects': aspects,
+        'updated_at': updated_at.isoformat() if updated_at else None,
+    }
+
+
+def rebuild_summaries(chunk_rows=5000):
+    """Recompute product_aspects from every review with key points"""
+    from models import ProductAspect, Review, session_scope
+
+    with session_scope() as session:
+        session.query(ProductAspect).delete()
+
+    processed = 0
+    last_id = 0
+    while True:
+        with session_scope() as session:
+            reviews = (
+                session.query(Review)
+                .filter(Review.id > last_id, Review.product_name.isnot(None), Review.key_points.isnot(None))
+                .order_by(Review.id)
+                .limit(chunk_rows)
+                .all()
+            )
+            if not reviews:
+                break
+            last_id = reviews[-1].id
+            record_key_points(session, reviews)
+            processed += len(reviews)
+            logger.info(f"Summarized {processed} reviews")
+    return {'reviews': processed}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python product_summary.py rebuild")
+        sys.exit(1)
+    print(rebuild_summaries())
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so trivial re-submissions share a key"""
+    return _WHITESPACE.sub(' ', text).strip().lower()
+
+
+def make_cache_key(kind, model_id, language, text):
+    """sha256 over result kind + model id + language + normalized text"""
+    raw = '\x1f'.join([kind, model_id or '', language or '', normalize_text(text)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache for analysis results.
+
+    Tier 1 is an in-process LRU (`max_size` entries), tier 2 is the optional
+    `analysis_cache` table on the shared SQLAlchemy engine. Both tiers expire
+    entries after `ttl_seconds` (0 disables expiry). `kind` separates the
+    sentiment results from Gemini key points, so each can be reused on its own.
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=86400, persistent=False, persistent_max_rows=100000):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self.persistent = persistent
+        self.persistent_max_rows = persistent_max_rows
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._writes_since_prune = 0
+        self.counters = {
+            'memory_hits': 0,
+            'persistent_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def get(self, kind, model_id, language, text):
+        """Return the cached value or None"""
+        key = make_cache_key(kind, model_id, language, text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return value
+                del self._entries[key]
+                self.counters['expirations'] += 1
+
+        if self.persistent:
+            value = self._get_persistent(key)
+            if value is not None:
+                self._set_memory(key, value)
+                with self._lock:
+                    self.counters['persistent_hits'] += 1
+                return value
+
+        with self._lock:
+            self.counters['misses'] += 1
+        return None
+
+    def set(self, kind, model_id, language, text, value):
+        key = make_cache_key(kind, model_id, language, text)
+        self._set_memory(key, value)
+        with self._lock:
+            self.counters['sets'] += 1
+        if self.persistent:
+            self._set_persistent(key, kind, value)
+
+    def stats(self):
+        with self._lock:
+            hits = self.counters['memory_hits'] + self.counters['persistent_hits']
+            lookups = hits + self.counters['misses']
+            return dict(
+                self.counters,
+                size=len(self._entries),
+                max_size=self.max_size,
+                ttl_seconds=self.ttl,
+                persistent=self.persistent,
+                hit_ratio=round(hits / lookups, 4) if lookups else 0.0,
+            )
+
+    def _set_memory(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _get_persistent(self, key):
+        from models import Session, AnalysisCache
+        session = Session()
+        try:
+            row = session.get(AnalysisCache, key)
+            if row is None:
+                return None
+            if self.ttl and row.created_at < datetime.utcnow() - timedelta(seconds=self.ttl):
+                session.delete(row)
+                session.commit()
+                with self._lock:
+                    self.counters['expirations'] += 1
+                return None
+            return json.loads(row.value)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Persistent cache read failed: {e}")
+            return None
+        finally:
+            session.close()
+
+    def _set_persistent(self, key, kind, value):
+        from models import Session, AnalysisCache
+        session = Session()
+        try:
+            session.merge(AnalysisCache(
+                key=key,
+                kind=kind,
+                value=json.dumps(value),
+                created_at=datetime.utcnow()
+            ))
+            session.commit()
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= 1000:
+                self._writes_since_prune = 0
+                self._prune_persistent(session)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Persistent cache write failed: {e}")
+        finally:
+            session.close()
+
+    def _prune_persistent(self, session):
+        """Drop expired rows and keep the table under persistent_max_rows"""
+        from models import AnalysisCache
+        if self.ttl:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+            session.query(AnalysisCache).filter(AnalysisCache.created_at < cutoff).delete()
+        overflow = session.query(AnalysisCache).count() - self.persistent_max_rows
+        if overflow > 0:
+            oldest = (
+                session.query(AnalysisCache.key)
+                .order_by(AnalysisCache.created_at.asc())
+                .limit(overflow)
+                .subquery()
+            )
+            session.query(AnalysisCache).filter(AnalysisCache.key.in_(oldest.select())).delete(
+                synchronize_session=False
+            )
+            with self._lock:
+                self.counters['evictions'] += overflow
+        session.commit()
@@ -0,0 +1,492 @@
+"""
+Retention for the reviews table: old rows move to compressed archive files on
+local disk, where they can still be queried and restored.
+
+- `archive` writes every review older than RETENTION_DAYS to
+  ARCHIVE_DIR/reviews-YYYY-MM-<first id>.jsonl.gz (or .parquet with
+  ARCHIVE_FORMAT=parquet, needs pyarrow), one file per month and chunk, then
+  deletes the rows with their signatures, LSH buckets and jobs in the same
+  transaction as the chunk. Files are complete on disk (fsync) before rows
+  are deleted, so a crash can only leave a row both archived and live; query
+  and restore skip such repeats by id.
+- Rollups (sentiment_stats.py) and product aspects keep counting archived
+  reviews, so /api/stats still covers the whole history.
+- On Postgres the reviews table can be range partitioned by month of
+  created_at (`partition`, one-off). Inserts and the created_at DESC listing
+  then only touch recent partitions, and `archive` drops partitions it has
+  emptied. Postgres cannot reference a partitioned table by id alone, so the
+  conversion drops the foreign keys to reviews; the code that removes
+  reviews (this module) cleans up dependents itself.
+
+    python retention.py archive [--days 365] [--dry-run]
+    python retention.py query [--start 2024-01-01] [--end 2024-02-01] [--product X] [--sentiment S] [--q text]
+    python retention.py restore (--id 1 --id 2 | --start 2024-01-01 --end 2024-02-01)
+    python retention.py partition             # Postgres only, run once during a maintenance window
+    python retention.py ensure-partitions     # also done by models.migrate
+"""
+from datetime import date, datetime, timedelta
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+ARCHIVE_FORMAT = os.getenv('ARCHIVE_FORMAT', 'jsonl').lower()
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '365'))
+ARCHIVE_CHUNK_ROWS = int(os.getenv('ARCHIVE_CHUNK_ROWS', '5000'))
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+
+DATETIME_COLUMNS = ('created_at', 'updated_at')
+_ARCHIVE_FILE = re.compile(r'^reviews-(\d{4})-(\d{2})-\d+\.(jsonl\.gz|parquet)$')
+_PARTITION = re.compile(r'^reviews_p(\d{4})_(\d{2})$')
+
+
+def archive_columns():
+    from models import Review
+    return [column.name for column in Review.__table__.columns]
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _as_datetime(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+# Archive files
+
+def _write_file(month, records, fmt):
+    """Write one archive file atomically (temp file, fsync, rename); returns its path"""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    suffix = 'parquet' if fmt == 'parquet' else 'jsonl.gz'
+    path = os.path.join(ARCHIVE_DIR, f"reviews-{month:%Y-%m}-{records[0]['id']:09d}.{suffix}")
+    temp_path = path + '.tmp'
+    if fmt == 'parquet':
+        import pyarrow
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(records), temp_path, compression='zstd')
+    else:
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, default=lambda value: value.isoformat(), ensure_ascii=False))
+                f.write('\n')
+    with open(temp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return path
+
+
+def _read_file(path):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet
+        yield from pyarrow.parquet.read_table(path).to_pylist()
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            for column in DATETIME_COLUMNS:
+                if record.get(column):
+                    record[column] = datetime.fromisoformat(record[column])
+            yield record
+
+
+def archive_files(start=None, end=None):
+    """Archive files whose month overlaps [start, end), oldest first"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    files = []
+    for name in sorted(os.listdir(ARCHIVE_DIR)):
+        match = _ARCHIVE_FILE.match(name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if start is not None and _as_datetime(next_month(month)) <= start:
+            continue
+        if end is not None and _as_datetime(month) >= end:
+            continue
+        files.append(os.path.join(ARCHIVE_DIR, name))
+    return files
+
+
+def query_archive(start=None, end=None, product_name=None, sentiment=None, q=None, ids=None, limit=None):
+    """Yield archived reviews (dicts like Review.to_dict) matching every given filter"""
+    ids = set(ids) if ids else None
+    q = q.lower() if q else None
+    seen = set()
+    returned = 0
+    for path in archive_files(start, end):
+        for record in _read_file(path):
+            if record['id'] in seen:
+                continue
+            created_at = record.get('created_at')
+            if start is not None and (created_at is None or created_at < start):
+                continue
+            if end is not None and (created_at is None or created_at >= end):
+                continue
+            if ids is not None and record['id'] not in ids:
+                continue
+            if product_name is not None and record.get('product_name') != product_name:
+                continue
+            if sentiment is not None and record.get('sentiment') != sentiment:
+                continue
+            if q is not None and q not in (record.get('review_text') or '').lower() \
+                    and q not in (record.get('key_points') or '').lower():
+                continue
+            seen.add(record['id'])
+            yield record
+            returned += 1
+            if limit is not None and returned >= limit:
+                return
+
+
+# Archive and restore
+
+def _delete_reviews(session, ids):
+    """Remove reviews and the rows that point at them (no FK cascades on a partitioned table)"""
+    from models import AnalysisJob, Review, ReviewLshBucket, ReviewSignature, bump_version
+    from sqlalchemy import update
+
+    session.query(ReviewLshBucket).filter(ReviewLshBucket.review_id.in_(ids)).delete(synchronize_session=False)
+    session.query(ReviewSignature).filter(ReviewSignature.review_id.in_(ids)).delete(synchronize_session=False)
+    session.query(AnalysisJob).filter(AnalysisJob.review_id.in_(ids)).delete(synchronize_session=False)
+    session.execute(
+        update(Review).where(Review.duplicate_of.in_(ids), Review.id.not_in(ids)).values(duplicate_of=None)
+    )
+    session.query(Review).filter(Review.id.in_(ids)).delete(synchronize_session=False)
+    bump_version(session)
+
+
+def archive_reviews(days=None, chunk_rows=None, dry_run=False, fmt=None):
+    """Move reviews created more than `days` days ago to the archive"""
+    from models import Review, Session, engine
+
+    days = RETENTION_DAYS if days is None else days
+    chunk_rows = chunk_rows or ARCHIVE_CHUNK_ROWS
+    fmt = fmt or ARCHIVE_FORMAT
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    columns = archive_columns()
+    started = time.monotonic()
+    archived = 0
+    files = []
+
+    if not dry_run:
+        ensure_partitions(engine)
+    session = Session()
+    try:
+        if dry_run:
+            count = session.query(Review).filter(Review.created_at < cutoff).count()
+            return {'cutoff': cutoff.isoformat(), 'reviews': count, 'dry_run': True}
+
+        while True:
+            # Oldest first along ix_reviews_created_at_id
+            rows = (
+                session.query(*[getattr(Review, column) for column in columns])
+                .filter(Review.created_at < cutoff)
+                .order_by(Review.created_at, Review.id)
+                .limit(chunk_rows)
+                .all()
+            )
+            if not rows:
+                break
+
+            by_month = {}
+            for row in rows:
+                by_month.setdefault(month_start(row.created_at), []).append(dict(zip(columns, row)))
+            for month, records in sorted(by_month.items()):
+                files.append(_write_file(month, records, fmt))
+
+            _delete_reviews(session, [row.id for row in rows])
+            session.commit()
+            archived += len(rows)
+            logger.info(f"Archived {archived} reviews")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    dropped = drop_old_partitions(cutoff)
+    logger.info(f"Archive finished in {time.monotonic() - started:.1f}s: {archived} reviews, {len(files)} files")
+    return {'cutoff': cutoff.isoformat(), 'reviews': archived, 'files': len(files), 'dropped_partitions': dropped}
+
+
+def restore_reviews(ids=None, start=None, end=None):
+    """Put archived reviews back into the reviews table; ids still present are skipped"""
+    from dedup import DEDUP_ENABLED, index_reviews
+    from models import Review, bump_version, session_scope
+
+    records = list(query_archive(start=start, end=end, ids=ids))
+    if not records:
+        return {'restored': 0, 'skipped': 0}
+
+    columns = set(archive_columns())
+    restored = skipped = 0
+    with session_scope() as session:
+        for offset in range(0, len(records), ARCHIVE_CHUNK_ROWS):
+            chunk = records[offset:offset + ARCHIVE_CHUNK_ROWS]
+            chunk_ids = [record['id'] for record in chunk]
+            present = {row.id for row in session.query(Review.id).filter(Review.id.in_(chunk_ids))}
+            rows = [{key: value for key, value in record.items() if key in columns}
+                    for record in chunk if record['id'] not in present]
+            skipped += len(chunk) - len(rows)
+            if not rows:
+                continue
+
+            # The original of a duplicate may itself still be archived
+            originals = {row['duplicate_of'] for row in rows if row.get('duplicate_of')}
+            if originals:
+                live = {row.id for row in session.query(Review.id).filter(Review.id.in_(originals))}
+                live |= {row['id'] for row in rows}
+                for row in rows:
+                    if row.get('duplicate_of') and row['duplicate_of'] not in live:
+                        row['duplicate_of'] = None
+
+            # Counted in the rollups and product aspects already (never removed on archive)
+            session.bulk_insert_mappings(Review, rows)
+            bump_version(session)
+            if DEDUP_ENABLED:
+                index_reviews(session, [(row['id'], row['review_text']) for row in rows if not row.get('duplicate_of')])
+            restored += len(rows)
+    logger.info(f"Restored {restored} reviews ({skipped} already present)")
+    return {'restored': restored, 'skipped': skipped}
+
+
+# Postgres partitioning
+
+def is_partitioned(bind):
+    if bind.dialect.name != 'postgresql':
+        return False
+    with bind.connect() as conn:
+        return conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'reviews' AND c.relnamespace = current_schema()::regnamespace"
+        )).first() is not None
+
+
+def partitions(conn):
+    """{month: partition name} of the monthly partitions of reviews"""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'reviews'::regclass"
+    )).scalars()
+    found = {}
+    for name in names:
+        match = _PARTITION.match(name)
+        if match:
+            found[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return found
+
+
+def _create_partition(conn, month):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS reviews_p{month:%Y_%m} PARTITION OF reviews "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    ))
+
+
+def _create_partition_from_default(conn, month):
+    """
+    Create the partition of `month`, first moving that month's rows out of
+    reviews_default (Postgres refuses the partition while they are there)
+    """
+    start, end = month.isoformat(), next_month(month).isoformat()
+    conn.execute(text("LOCK TABLE reviews_default IN ACCESS EXCLUSIVE MODE"))
+    conn.execute(text(
+        "CREATE TEMP TABLE reviews_moving ON COMMIT DROP AS "
+        "SELECT * FROM reviews_default WHERE created_at >= :start AND created_at < :end"
+    ), {'start': start, 'end': end})
+    moved = conn.execute(text(
+        "DELETE FROM reviews_default WHERE created_at >= :start AND created_at < :end"
+    ), {'start': start, 'end': end}).rowcount
+    _create_partition(conn, month)
+    columns = ', '.join(archive_columns())
+    conn.execute(text(f"INSERT INTO reviews ({columns}) SELECT {columns} FROM reviews_moving"))
+    return moved
+
+
+def _default_months(conn):
+    """{month: rows} of the reviews sitting in reviews_default"""
+    if conn.execute(text("SELECT to_regclass('reviews_default')")).scalar() is None:
+        return {}
+    rows = conn.execute(text(
+        "SELECT date_trunc('month', created_at) AS month, count(*) FROM reviews_default GROUP BY 1"
+    ))
+    return {month_start(month): count for month, count in rows}
+
+
+def ensure_partitions(bind, months_ahead=None):
+    """
+    Create the monthly partitions up to `months_ahead` months from now, plus
+    one for every month with rows in reviews_default (moving those rows into
+    it); no-op when not partitioned. Runs at startup, before an archive and
+    periodically from the job workers
+    """
+    if not is_partitioned(bind):
+        return []
+    months_ahead = PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    created = []
+    with bind.connect() as conn:
+        existing = partitions(conn)
+        wanted = []
+        month = month_start(datetime.utcnow())
+        for _ in range(months_ahead + 1):
+            wanted.append(month)
+            month = next_month(month)
+        # Also the months whose rows fell into the default partition
+        wanted = sorted(set(wanted) | set(_default_months(conn)))
+        for month in wanted:
+            if month in existing:
+                continue
+            try:
+                moved = _create_partition_from_default(conn, month)
+                conn.commit()
+                created.append(month.isoformat())
+                if moved:
+                    logger.info(f"Moved {moved} reviews from reviews_default into the {month:%Y-%m} partition")
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"Could not create partition for {month:%Y-%m}: {e}")
+        leftover = sum(_default_months(conn).values())
+    if created:
+        logger.info(f"Created review partitions: {', '.join(created)}")
+    if leftover:
+        logger.warning(f"reviews_default still holds {leftover} reviews outside the monthly partitions")
+    return created
+
+
+def drop_old_partitions(cutoff):
+    """Drop monthly partitions that end before `cutoff` and are empty; returns their names"""
+    from models import engine
+
+    if not is_partitioned(engine):
+        return []
+    dropped = []
+    with engine.connect() as conn:
+        for month, name in sorted(partitions(conn).items()):
+            if _as_datetime(next_month(month)) > cutoff:
+                continue
+            if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is not None:
+                continue
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+        conn.commit()
+    if dropped:
+        logger.info(f"Dropped empty partitions: {', '.join(dropped)}")
+    return dropped
+
+
+def convert_to_partitioned(bind=None):
+    """
+    Rebuild reviews as a table partitioned by month of created_at, in one
+    transaction (the table is locked while rows are copied)
+    """
+    from models import Review, engine
+    import search_index
+
+    bind = bind or engine
+    if bind.dialect.name != 'postgresql':
+        raise RuntimeError('Partitioning is only supported on PostgreSQL')
+    if is_partitioned(bind):
+        logger.info("reviews is already partitioned")
+        return {'partitioned': False}
+
+    columns = ', '.join(archive_columns())
+    started = time.monotonic()
+    with bind.begin() as conn:
+        conn.execute(text('LOCK TABLE reviews IN ACCESS EXCLUSIVE MODE'))
+        # Foreign keys cannot reference a partitioned table by id alone
+        for table_name, constraint in conn.execute(text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = 'reviews'::regclass"
+        )).all():
+            conn.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT "{constraint}"'))
+        # created_at becomes part of the primary key
+        conn.execute(text('UPDATE reviews SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL'))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence('reviews', 'id')")).scalar()
+        first = conn.execute(text('SELECT min(created_at) FROM reviews')).scalar()
+
+        conn.execute(text('ALTER TABLE reviews RENAME TO reviews_unpartitioned'))
+        conn.execute(text(
+            'CREATE TABLE reviews (LIKE reviews_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED) '
+            'PARTITION BY RANGE (created_at)'
+        ))
+        month = month_start(first or datetime.utcnow())
+        last = month_start(datetime.utcnow())
+        for _ in range(PARTITION_MONTHS_AHEAD):
+            last = next_month(last)
+        while month <= last:
+            _create_partition(conn, month)
+            month = next_month(month)
+        conn.execute(text('CREATE TABLE reviews_default PARTITION OF reviews DEFAULT'))
+
+        conn.execute(text(f'INSERT INTO reviews ({columns}) SELECT {columns} FROM reviews_unpartitioned'))
+        if sequence:
+            conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY reviews.id'))
+        copied = conn.execute(text('SELECT count(*) FROM reviews')).scalar()
+        # Frees reviews_pkey and the index names for the partitioned indexes below
+        conn.execute(text('DROP TABLE reviews_unpartitioned'))
+        conn.execute(text('ALTER TABLE reviews ADD PRIMARY KEY (id, created_at)'))
+        for index in Review.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+    search_index.install(bind)
+    logger.info(f"Partitioned reviews ({copied} rows) in {time.monotonic() - started:.1f}s")
+    return {'partitioned': True, 'reviews': copied}
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Review retention and archive')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    archive_parser = subparsers.add_parser('archive', help='move old reviews to the archive')
+    archive_parser.add_argument('--days', type=int, default=RETENTION_DAYS)
+    archive_parser.add_argument('--format', choices=('jsonl', 'parquet'), default=ARCHIVE_FORMAT)
+    archive_parser.add_argument('--dry-run', action='store_true', help='only count the reviews to archive')
+    for name, help_text in (('query', 'print archived reviews as JSON lines'), ('restore', 'restore archived reviews')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--start', type=_parse_datetime, help='created_at >= (ISO date)')
+        sub.add_argument('--end', type=_parse_datetime, help='created_at < (ISO date)')
+        sub.add_argument('--id', type=int, action='append', dest='ids')
+        if name == 'query':
+            sub.add_argument('--product')
+            sub.add_argument('--sentiment')
+            sub.add_argument('--q', help='substring of the review text or key points')
+            sub.add_argument('--limit', type=int, default=100)
+    subparsers.add_parser('partition', help='partition reviews by month (PostgreSQL)')
+    subparsers.add_parser('ensure-partitions', help='create the upcoming monthly partitions (PostgreSQL)')
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        for record in query_archive(args.start, args.end, args.product, args.sentiment, args.q, args.ids, args.limit):
+            print(json.dumps(record, default=lambda value: value.isoformat(), ensure_ascii=False))
+        sys.exit(0)
+
+    from models import engine, migrate
+    migrate()
+    if args.command == 'archive':
+        print(archive_reviews(days=args.days, dry_run=args.dry_run, fmt=args.format))
+    elif args.command == 'restore':
+        if not (args.ids or args.start or args.end):
+            parser.error('give --id or a --start/--end range')
+        print(restore_reviews(ids=args.ids, start=args.start, end=args.end))
+    elif args.command == 'partition':
+        print(convert_to_partitioned(engine))
+    else:
+        print(ensure_partitions(engine))
@@ -0,0 +1,173 @@
+"""
+Full-text index over review_text, key_points and product_name.
+
+- Postgres: a generated `search_vector` tsvector column (product name weighted
+  highest, then key points, then review text) with a GIN index
+- SQLite: an external content FTS5 table `reviews_fts` kept in sync by
+  triggers on reviews
+
+Both are maintained by the database itself, so every write path (API, bulk
+ingest, key points jobs filling in key_points) updates the index in the same
+transaction. Other databases, or SQLite builds without FTS5, fall back to an
+unranked LIKE scan.
+
+    python search_index.py rebuild    # repopulate the SQLite FTS5 table
+"""
+import logging
+import re
+
+from sqlalchemy import func, inspect, literal, literal_column, or_, table, column, text
+
+logger = logging.getLogger(__name__)
+
+TEXT_CONFIG = 'simple'  # mixed Indonesian/English text, no stemming
+
+POSTGRES_VECTOR = (
+    f"setweight(to_tsvector('{TEXT_CONFIG}', coalesce(product_name, '')), 'A') || "
+    f"setweight(to_tsvector('{TEXT_CONFIG}', coalesce(key_points, '')), 'B') || "
+    f"setweight(to_tsvector('{TEXT_CONFIG}', coalesce(review_text, '')), 'C')"
+)
+
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+        review_text, key_points, product_name,
+        content='reviews', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS reviews_fts_insert AFTER INSERT ON reviews BEGIN
+        INSERT INTO reviews_fts(rowid, review_text, key_points, product_name)
+        VALUES (new.id, new.review_text, new.key_points, new.product_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS reviews_fts_delete AFTER DELETE ON reviews BEGIN
+        INSERT INTO reviews_fts(reviews_fts, rowid, review_text, key_points, product_name)
+        VALUES ('delete', old.id, old.review_text, old.key_points, old.product_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS reviews_fts_update AFTER UPDATE OF review_text, key_points, product_name ON reviews BEGIN
+        INSERT INTO reviews_fts(reviews_fts, rowid, review_text, key_points, product_name)
+        VALUES ('delete', old.id, old.review_text, old.key_points, old.product_name);
+        INSERT INTO reviews_fts(rowid, review_text, key_points, product_name)
+        VALUES (new.id, new.review_text, new.key_points, new.product_name);
+    END""",
+]
+
+# bm25 weights for review_text, key_points, product_name
+SQLITE_WEIGHTS = (1.0, 2.0, 4.0)
+
+_fts_available = {}  # dialect name -> bool, checked once per process
+
+
+def install(bind):
+    """Create the index for the current database; safe to run repeatedly"""
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        columns = [col['name'] for col in inspect(bind).get_columns('reviews')]
+        with bind.connect() as conn:
+            if 'search_vector' not in columns:
+                # Existing rows are filled in by the ALTER itself
+                conn.execute(text(
+                    f"ALTER TABLE reviews ADD COLUMN search_vector tsvector "
+                    f"GENERATED ALWAYS AS ({POSTGRES_VECTOR}) STORED"
+                ))
+            conn.execute(text(
+                'CREATE INDEX IF NOT EXISTS ix_reviews_search_vector ON reviews USING GIN (search_vector)'
+            ))
+            conn.commit()
+    elif dialect == 'sqlite':
+        with bind.connect() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reviews_fts'"
+            )).first() is not None
+            try:
+                for statement in SQLITE_SCHEMA:
+                    conn.execute(text(statement))
+                if not exists:
+                    conn.execute(text("INSERT INTO reviews_fts(reviews_fts) VALUES ('rebuild')"))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"SQLite FTS5 unavailable, search falls back to LIKE: {e}")
+
+
+def rebuild(bind):
+    """Repopulate the SQLite FTS5 table from reviews (Postgres needs no rebuild)"""
+    if bind.dialect.name != 'sqlite':
+        return
+    with bind.connect() as conn:
+        conn.execute(text("INSERT INTO reviews_fts(reviews_fts) VALUES ('rebuild')"))
+        conn.commit()
+
+
+def _has_fts(session):
+    bind = session.get_bind()
+    dialect = bind.dialect.name
+    if dialect not in _fts_available:
+        if dialect == 'postgresql':
+            columns = [col['name'] for col in inspect(bind).get_columns('reviews')]
+            _fts_available[dialect] = 'search_vector' in columns
+        elif dialect == 'sqlite':
+            _fts_available[dialect] = session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reviews_fts'"
+            )).first() is not None
+        else:
+            _fts_available[dialect] = False
+    return dialect if _fts_available[dialect] else None
+
+
+def terms(q):
+    """Words of the query; punctuation and FTS operators are dropped"""
+    return re.findall(r'\w+', q.lower(), re.UNICODE)
+
+
+def search_query(session, q):
+    """
+    Query yielding (Review, score) rows matching every term of `q`, best match
+    first. The caller adds filters, ordering tie-breaks and pagination.
+    """
+    from models import Review
+
+    words = terms(q)
+    backend = _has_fts(session)
+
+    if backend == 'postgresql':
+        vector = literal_column('reviews.search_vector')
+        tsquery = func.websearch_to_tsquery(TEXT_CONFIG, ' '.join(words))
+        score = func.ts_rank_cd(vector, tsquery)
+        return (
+            session.query(Review, score.label('score'))
+            .filter(vector.op('@@')(tsquery))
+            .order_by(score.desc())
+        )
+
+    if backend == 'sqlite':
+        fts = table('reviews_fts', column('rowid'))
+        # Every word quoted, so user input can never be read as FTS5 syntax
+        match = ' '.join(f'"{word}"' for word in words)
+        score = -func.bm25(literal_column('reviews_fts'), *SQLITE_WEIGHTS)
+        return (
+            session.query(Review, score.label('score'))
+            .join(fts, fts.c.rowid == Review.id)
+            .filter(literal_column('reviews_fts').op('MATCH')(match))
+            .order_by(score.desc())
+        )
+
+    query = session.query(Review, literal(0.0).label('score'))
+    for word in words:
+        pattern = f'%{word}%'
+        query = query.filter(or_(
+            Review.review_text.ilike(pattern),
+            Review.key_points.ilike(pattern),
+            Review.product_name.ilike(pattern)
+        ))
+    return query.order_by(Review.created_at.desc())
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python search_index.py rebuild")
+        sys.exit(1)
+    from models import engine
+    install(engine)
+    rebuild(engine)
+    print("Search index rebuilt")
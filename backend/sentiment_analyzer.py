@@ -1,72 +1,175 @@
-from transformers import pipeline
 import os
 from dotenv import load_dotenv
 
+from metrics import stage
+
 load_dotenv()
 
+MULTILINGUAL_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+ENGLISH_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
 class SentimentAnalyzer:
-    def __init__(self):
-        # Using multilingual model that supports Indonesian, English, and many other languages
+    def __init__(self, model_name=None):
+        # Using multilingual model that supports Indonesian, English, and many other languages,
+        # unless a specific model is given (language routing, see language_router.py)
         hf_token = os.getenv('HUGGINGFACE_API_KEY')
+        # Micro-batch size used by analyze_batch (padded batches on CPU)
+        self.batch_size = int(os.getenv('SENTIMENT_BATCH_SIZE', '16'))
+        # Inference backend: pytorch, pytorch-int8 or onnxruntime (see model_backends.py)
+        from model_backends import BACKENDS
+        self.backend = os.getenv('SENTIMENT_BACKEND', 'pytorch').lower()
+        if self.backend not in BACKENDS:
+            print(f"Unknown SENTIMENT_BACKEND '{self.backend}', using pytorch")
+            self.backend = 'pytorch'
+        self.cache_dir = os.getenv('SENTIMENT_MODEL_CACHE_DIR', 'model_cache')
+        # Reviews longer than one window: 'chunk' analyzes every token window,
+        # 'truncate' keeps only the first 512 characters
+        self.long_text_mode = os.getenv('SENTIMENT_LONG_TEXT_MODE', 'chunk').lower()
+        self.chunk_tokens = int(os.getenv('SENTIMENT_CHUNK_TOKENS', '512'))
+        self.chunk_stride = int(os.getenv('SENTIMENT_CHUNK_STRIDE', '128'))
         
+        if model_name:
+            self.model_name = model_name
+            self.analyzer = self._load(self.model_name, hf_token)
+            print(f"Loaded sentiment analyzer {self.model_name} on {self.backend}")
+        else:
+            self._load_default(hf_token)
+        # Results can differ slightly between backends, so they are cached separately
+        self.model_id = f"{self.model_name}:{self.backend}"
+        if self.long_text_mode == 'chunk':
+            self.model_id += ':chunk'
+
+    def _load_default(self, hf_token):
         try:
-            self.analyzer = pipeline(
-                "sentiment-analysis",
-                model="nlptown/bert-base-multilingual-uncased-sentiment",
-                token=hf_token if hf_token else None,
-                device=-1  # Use CPU explicitly to avoid meta tensor issues
-            )
-            print("Loaded multilingual sentiment analyzer (supports Indonesian)")
+            self.model_name = MULTILINGUAL_MODEL
+            self.analyzer = self._load(self.model_name, hf_token)
+            print(f"Loaded multilingual sentiment analyzer (supports Indonesian) on {self.backend}")
         except Exception as e:
             print(f"Error loading multilingual model: {e}")
             try:
                 # Fallback to English model
-                self.analyzer = pipeline(
-                    "sentiment-analysis",
-                    model="distilbert-base-uncased-finetuned-sst-2-english",
-                    token=hf_token if hf_token else None,
-                    device=-1
-                )
-                print("Loaded English sentiment analyzer (fallback)")
+                self.model_name = ENGLISH_MODEL
+                self.analyzer = self._load(self.model_name, hf_token)
+                print(f"Loaded English sentiment analyzer (fallback) on {self.backend}")
             except Exception as e2:
                 print(f"Error loading model: {e2}")
                 raise
+
+    def _load(self, model_name, hf_token):
+        from model_backends import load_backend
+        try:
+            return load_backend(self.backend, model_name, self.cache_dir, hf_token=hf_token or None)
+        except Exception as e:
+            if self.backend == 'pytorch':
+                raise
+            print(f"Error loading {self.backend} backend, using pytorch: {e}")
+            self.backend = 'pytorch'
+            return load_backend('pytorch', model_name, self.cache_dir, hf_token=hf_token or None)
     
     def analyze(self, text):
         """
         Analyze sentiment of text (supports Indonesian and other languages)
-        Returns: dict with 'sentiment' and 'confidence_score'
+        Returns: dict with 'sentiment' and 'confidence_score'; on an error the
+        neutral fallback also has 'error': True (never cached)
         """
         try:
-            result = self.analyzer(text[:512])[0]  # Limit to 512 chars
-            
-            # Map different label formats from different models
-            label = result['label'].upper().strip()
-            
-            # Handle multilingual model output (5 STARS, 4 STARS, etc.)
-            if label in ['5 STARS', '5STARS', '4 STARS', '4STARS']:
-                sentiment = 'positive'
-            elif label in ['1 STAR', '1STAR', '2 STARS', '2STARS', '3 STARS', '3STARS']:
-                sentiment = 'negative' if label.startswith('1') or label.startswith('2') else 'neutral'
-            # Handle English model output (POSITIVE, NEGATIVE, NEUTRAL)
-            elif label in ['POSITIVE']:
-                sentiment = 'positive'
-            elif label in ['NEGATIVE']:
-                sentiment = 'negative'
-            else:
-                sentiment = 'neutral'
-            
-            confidence = result['score']
-            
-            print(f"Label: {label}, Sentiment: {sentiment}, Score: {confidence}")
-            
-            return {
-                'sentiment': sentiment,
-                'confidence_score': round(confidence, 4)
-            }
+            if self._is_long(text):
+                return self._to_sentiment(self._chunked([text])[0])
+            with stage('sentiment_forward'):
+                result = self._predict([text[:512]])[0]  # Limit to 512 chars
+            return self._to_sentiment(result)
         except Exception as e:
             print(f"Sentiment analysis error: {e}")
             return {
                 'sentiment': 'neutral',
-                'confidence_score': 0.5
-            }
\ No newline at end of file
+                'confidence_score': 0.5,
+                'error': True
+            }
+
+    def analyze_batch(self, texts, batch_size=None):
+        """
+        Analyze many texts with padded micro-batches instead of one pipeline call per text
+        Returns: list in the same order as `texts`, each item is a dict like analyze()
+        or None when that text could not be analyzed
+        """
+        if not texts:
+            return []
+        batch_size = batch_size or self.batch_size
+        long_indexes = [i for i, text in enumerate(texts) if self._is_long(text)]
+        short_indexes = [i for i, text in enumerate(texts) if not self._is_long(text)]
+        results = [None] * len(texts)
+
+        try:
+            if short_indexes:
+                truncated = [texts[i][:512] for i in short_indexes]  # Same 512 chars limit as analyze()
+                with stage('sentiment_forward_batch'):
+                    outputs = self._predict(truncated, batch_size=batch_size)
+                for i, output in zip(short_indexes, outputs):
+                    results[i] = self._to_sentiment(output)
+            if long_indexes:
+                # Windows of all long texts share the same padded batches
+                outputs = self._chunked([texts[i] for i in long_indexes], batch_size=batch_size)
+                for i, output in zip(long_indexes, outputs):
+                    results[i] = self._to_sentiment(output)
+            return results
+        except Exception as e:
+            print(f"Batch sentiment analysis error, retrying per text: {e}")
+
+        # One bad text should not fail the whole batch
+        results = []
+        for text in texts:
+            try:
+                if self._is_long(text):
+                    results.append(self._to_sentiment(self._chunked([text])[0]))
+                else:
+                    results.append(self._to_sentiment(self._predict([text[:512]])[0]))
+            except Exception as e:
+                print(f"Sentiment analysis error: {e}")
+                results.append(None)
+        return results
+
+    def _is_long(self, text):
+        # Anything up to 512 characters fits in a single 512 token window
+        return self.long_text_mode == 'chunk' and len(text) > 512
+
+    def _predict(self, texts, batch_size=None):
+        from model_backends import predict
+        return predict(self.analyzer, texts, batch_size=batch_size or self.batch_size)
+
+    def _chunked(self, texts, batch_size=None):
+        from model_backends import chunked_predict
+        with stage('sentiment_chunked'):
+            return chunked_predict(
+                self.analyzer,
+                texts,
+                max_length=self.chunk_tokens,
+                stride=self.chunk_stride,
+                batch_size=batch_size or self.batch_size
+            )
+
+    def _to_sentiment(self, result):
+        """Map a raw pipeline output ({'label', 'score'}) to our sentiment dict"""
+        # Map different label formats from different models
+        label = result['label'].upper().strip()
+
+        # Handle multilingual model output (5 STARS, 4 STARS, etc.)
+        if label in ['5 STARS', '5STARS', '4 STARS', '4STARS']:
+            sentiment = 'positive'
+        elif label in ['1 STAR', '1STAR', '2 STARS', '2STARS', '3 STARS', '3STARS']:
+            sentiment = 'negative' if label.startswith('1') or label.startswith('2') else 'neutral'
+        # Handle English model output (POSITIVE, NEGATIVE, NEUTRAL)
+        elif label in ['POSITIVE']:
+            sentiment = 'positive'
+        elif label in ['NEGATIVE']:
+            sentiment = 'negative'
+        else:
+            sentiment = 'neutral'
+
+        confidence = result['score']
+
+        print(f"Label: {label}, Sentiment: {sentiment}, Score: {confidence}")
+
+        return {
+            'sentiment': sentiment,
+            'confidence_score': round(confidence, 4)
+        }
@@ -0,0 +1,266 @@
+"""
+Two tier sentiment: an Indonesian/English lexicon answers the obvious reviews,
+the full model (BERT) only sees the ones the lexicon is unsure about.
+
+The lexicon scores polarity words (with negation: "tidak bagus", "not good"
+flip the next polarity word within the clause) and emoji. Its confidence grows with the number of cues
+that agree and drops when positive and negative cues are mixed ("bagus tapi
+pengiriman lambat"); results below SENTIMENT_CASCADE_THRESHOLD, and every
+neutral-looking text, go to the model. Each result carries 'tier': 'lexicon'
+or 'model', stored in reviews.sentiment_tier.
+
+Measure agreement with the full model and the speedup on your own data:
+    python sentiment_cascade.py evaluate reviews.csv [--limit 2000] [--thresholds 0.8 0.85 0.9]
+    python sentiment_cascade.py evaluate --db [--limit 2000]
+"""
+import logging
+import os
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_CASCADE = os.getenv('SENTIMENT_CASCADE', 'false').lower() == 'true'
+SENTIMENT_CASCADE_THRESHOLD = float(os.getenv('SENTIMENT_CASCADE_THRESHOLD', '0.85'))
+
+# word -> weight; ambiguous words ("cepat" rusak, tahan "lama", "cheap") are left out
+POSITIVE = {
+    'bagus': 1, 'baik': 1, 'mantap': 2, 'mantul': 2, 'keren': 1, 'puas': 2, 'memuaskan': 2,
+    'suka': 1, 'senang': 1, 'recommended': 2, 'rekomen': 2, 'rekomendasi': 1, 'top': 1, 'jos': 1,
+    'rapi': 1, 'awet': 1, 'sesuai': 1, 'original': 1, 'ori': 1, 'ramah': 1, 'aman': 1,
+    'responsif': 1, 'terbaik': 2, 'sempurna': 2, 'nyaman': 1, 'jernih': 1, 'lancar': 1,
+    'berfungsi': 1, 'sip': 1, 'worth': 1, 'terimakasih': 1,
+    'good': 1, 'great': 2, 'excellent': 2, 'amazing': 2, 'awesome': 2, 'love': 2, 'loved': 2,
+    'loves': 2, 'perfect': 2, 'recommend': 2, 'happy': 1, 'satisfied': 2, 'nice': 1, 'best': 2,
+    'fantastic': 2, 'works': 1, 'sturdy': 1, 'comfortable': 1, 'genuine': 1, 'smoothly': 1,
+}
+NEGATIVE = {
+    'jelek': 2, 'rusak': 2, 'kecewa': 2, 'mengecewakan': 2, 'buruk': 2, 'lambat': 1, 'parah': 2,
+    'zonk': 2, 'palsu': 2, 'kw': 1, 'cacat': 2, 'penyok': 1, 'nyesel': 2, 'menyesal': 2,
+    'bohong': 2, 'penipu': 2, 'tipu': 2, 'kapok': 2, 'hancur': 2, 'pecah': 1, 'bocor': 1,
+    'lemot': 1, 'sobek': 1, 'kotor': 1, 'telat': 1, 'terlambat': 1, 'error': 1, 'retur': 1,
+    'bad': 1, 'terrible': 2, 'awful': 2, 'horrible': 2, 'poor': 1, 'broken': 2, 'broke': 2,
+    'disappointed': 2, 'disappointing': 2, 'worst': 2, 'waste': 2, 'useless': 2, 'defective': 2,
+    'fake': 2, 'refund': 1, 'damaged': 2, 'slow': 1, 'late': 1, 'scam': 2, 'faulty': 2,
+    'hate': 2, 'stopped': 1, 'returned': 1,
+}
+NEGATORS = {
+    'tidak', 'tak', 'gak', 'ga', 'nggak', 'enggak', 'ngga', 'kurang', 'bukan', 'belum', 'jangan',
+    'not', 'no', 'never', "don't", "doesn't", "didn't", "isn't", "wasn't", "won't", "can't",
+    'cannot', 'dont', 'doesnt', 'didnt', 'isnt', 'wasnt', 'wont', 'cant',
+}
+NEGATION_WINDOW = 2  # words after a negator searched for the polarity word it flips
+# Negate a noun rather than a quality ("no issues", "tidak ada masalah"): only a
+# polarity word right after them is flipped, anything else ends the negation
+NOUN_NEGATORS = {'no', 'nothing', 'without', 'tanpa'}
+EXISTENTIAL = 'ada'  # "tidak ada", "gak ada" behave like "no"
+
+POSITIVE_EMOJI = set('👍😍🥰😊😁❤💯🔥⭐')
+NEGATIVE_EMOJI = set('👎😡😠😤😞😢😭💔🤬')
+
+# Words, plus clause punctuation that ends a negation ("no complaints, love it")
+CLAUSE_BREAKS = set('.,;:!?')
+_TOKEN = re.compile(r"[\w']+|[.,;:!?]", re.UNICODE)
+
+
+def lexicon_score(text):
+    """
+    (positive weight, negative weight, weight of cues that were not negated)
+    of the cues in `text`
+    """
+    positive = negative = plain = 0
+    negated = 0
+    for token in _TOKEN.findall(text.lower()):
+        if token in CLAUSE_BREAKS:
+            negated = 0
+            continue
+        if token in NEGATORS or token in NOUN_NEGATORS:
+            negated = 1 if token in NOUN_NEGATORS else NEGATION_WINDOW
+            continue
+        if negated and token == EXISTENTIAL:
+            negated = 1
+            continue
+        weight = POSITIVE.get(token, 0) - NEGATIVE.get(token, 0)
+        if negated:
+            # Only the first polarity word is negated ("tidak terlalu bagus, kecewa");
+            # a window without one expires
+            negated = 0 if weight else negated - 1
+            # "tidak bagus" is clearly negative; "not bad" is dropped rather than counted positive
+            weight = -weight if weight > 0 else 0
+        else:
+            plain += abs(weight)
+        if weight > 0:
+            positive += weight
+        elif weight < 0:
+            negative -= weight
+    for char in text:
+        if char in POSITIVE_EMOJI:
+            positive += 1
+            plain += 1
+        elif char in NEGATIVE_EMOJI:
+            negative += 1
+            plain += 1
+    return positive, negative, plain
+
+
+def lexicon_sentiment(text):
+    """
+    {'sentiment', 'confidence_score'} from the lexicon; confidence is 0 when
+    there are no cues, or when every cue was negated (negation is the lexicon's
+    weakest guess, so those texts always go to the model). 1 agreeing cue of
+    weight 1 gives 0.75, weight 2 gives 0.875, weight 3 gives 0.9375; mixed
+    cues lower it by their share
+    """
+    positive, negative, plain = lexicon_score(text)
+    if positive == negative or not plain:
+        return {'sentiment': 'neutral', 'confidence_score': 0.0}
+    total = positive + negative
+    purity = abs(positive - negative) / total
+    strength = 1 - 0.5 ** total
+    confidence = 0.5 + 0.5 * purity * strength
+    return {
+        'sentiment': 'positive' if positive > negative else 'negative',
+        'confidence_score': round(confidence, 4),
+    }
+
+
+class CascadeAnalyzer:
+    """
+    analyze()/analyze_batch() in front of `analyzer`: texts the lexicon is at
+    least `threshold` sure about are answered directly, the rest are passed on
+    (batched) to the full model. Anything else (stats(), ...) is `analyzer`'s.
+    """
+
+    def __init__(self, analyzer, threshold=SENTIMENT_CASCADE_THRESHOLD):
+        self.analyzer = analyzer
+        self.threshold = threshold
+        self.model_name = getattr(analyzer, 'model_name', None)
+        # Cached results depend on the threshold
+        self.model_id = f"cascade:{threshold}|{getattr(analyzer, 'model_id', self.model_name)}"
+        logger.info(f"Sentiment cascade enabled (lexicon threshold {threshold})")
+
+    def __getattr__(self, name):
+        if name == 'analyzer':
+            raise AttributeError(name)
+        return getattr(self.analyzer, name)
+
+    def _lexicon(self, text):
+        result = lexicon_sentiment(text)
+        if result['confidence_score'] >= self.threshold:
+            return dict(result, tier='lexicon')
+        return None
+
+    def analyze(self, text):
+        result = self._lexicon(text)
+        if result is None:
+            result = dict(self.analyzer.analyze(text), tier='model')
+        _count(result['tier'])
+        return result
+
+    def analyze_batch(self, texts, batch_size=None):
+        results = [self._lexicon(text) for text in texts]
+        uncertain = [index for index, result in enumerate(results) if result is None]
+        if uncertain:
+            outputs = self.analyzer.analyze_batch([texts[index] for index in uncertain], batch_size=batch_size)
+            for index, output in zip(uncertain, outputs):
+                results[index] = dict(output, tier='model') if output is not None else None
+        for result in results:
+            if result is not None:
+                _count(result['tier'])
+        return results
+
+
+def _count(tier):
+    import metrics
+    if metrics.ENABLED:
+        metrics.SENTIMENT_TIERS.inc(tier)
+
+
+def _load_texts(path, limit):
+    if path:
+        from ingest import iter_records
+        fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+        texts = []
+        for record, _ in iter_records(path, fmt):
+            text = (record.get('review_text') or '').strip()
+            if text:
+                texts.append(text)
+                if len(texts) >= limit:
+                    break
+        return texts
+
+    from models import Review, session_scope
+    with session_scope() as session:
+        rows = (
+            session.query(Review.review_text)
+            .filter(Review.duplicate_of.is_(None))
+            .order_by(Review.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [row.review_text for row in rows]
+
+
+def evaluate(texts, thresholds, batch_size=None):
+    """
+    Run the full model and the lexicon over `texts`; per threshold report the
+    share answered by the lexicon, its agreement with the model on those
+    texts, the overall agreement of the cascade and the estimated speedup
+    """
+    from sentiment_analyzer import SentimentAnalyzer
+
+    model = SentimentAnalyzer()
+    started = time.perf_counter()
+    full = model.analyze_batch(texts, batch_size=batch_size)
+    model_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    lexicon = [lexicon_sentiment(text) for text in texts]
+    lexicon_seconds = time.perf_counter() - started
+
+    pairs = [(lex, ref) for lex, ref in zip(lexicon, full) if ref is not None]
+    per_text = model_seconds / max(1, len(texts))
+    report = {
+        'texts': len(texts),
+        'model': model.model_id,
+        'model_texts_per_second': round(len(texts) / model_seconds, 1) if model_seconds else None,
+        'lexicon_ms_total': round(lexicon_seconds * 1000, 2),
+        'thresholds': [],
+    }
+    for threshold in thresholds:
+        handled = [(lex, ref) for lex, ref in pairs if lex['confidence_score'] >= threshold]
+        agree = sum(1 for lex, ref in handled if lex['sentiment'] == ref['sentiment'])
+        # Remaining texts still pay the model's per text cost
+        cascade_seconds = lexicon_seconds + per_text * (len(pairs) - len(handled))
+        report['thresholds'].append({
+            'threshold': threshold,
+            'lexicon_share': round(len(handled) / len(pairs), 4) if pairs else 0.0,
+            'lexicon_agreement': round(agree / len(handled), 4) if handled else None,
+            'cascade_agreement': round((len(pairs) - len(handled) + agree) / len(pairs), 4) if pairs else None,
+            'speedup': round(model_seconds / cascade_seconds, 2) if cascade_seconds else None,
+        })
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Lexicon/model sentiment cascade')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    evaluate_parser = subparsers.add_parser('evaluate', help='agreement with the full model and throughput gain')
+    evaluate_parser.add_argument('path', nargs='?', help='CSV or JSONL file with a review_text column')
+    evaluate_parser.add_argument('--db', action='store_true', help='use the latest stored reviews instead of a file')
+    evaluate_parser.add_argument('--limit', type=int, default=2000)
+    evaluate_parser.add_argument('--batch-size', type=int, default=None)
+    evaluate_parser.add_argument('--thresholds', type=float, nargs='+', default=[0.75, 0.8, 0.85, 0.9, 0.95])
+    args = parser.parse_args()
+
+    if not args.path and not args.db:
+        parser.error('give a file or --db')
+    texts = _load_texts(None if args.db else args.path, args.limit)
+    if not texts:
+        print("No reviews to evaluate")
+        sys.exit(1)
+    print(json.dumps(evaluate(texts, args.thresholds, batch_size=args.batch_size), indent=2))
@@ -0,0 +1,206 @@
+"""
+Pre-aggregated sentiment statistics served by GET /api/stats.
+
+Every saved review increments one row of the sentiment_rollups table (per
+day, product, language and sentiment) inside the same transaction, so the
+stats endpoint never scans the reviews table.
+
+Rebuild the rollups from scratch with:
+    python sentiment_stats.py rebuild
+(a rebuild only sees the reviews table, not reviews archived by retention.py)
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ('day', 'week', 'month')
+
+
+def day_bucket(created_at):
+    created_at = created_at or datetime.utcnow()
+    return datetime(created_at.year, created_at.month, created_at.day)
+
+
+def _upsert(session, values):
+    """INSERT ... ON CONFLICT DO UPDATE adding to the counters (SQLite and Postgres)"""
+    from models import SentimentRollup
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        insert = None
+
+    if insert is None:
+        # Fallback for other databases: read-modify-write
+        row = session.query(SentimentRollup).filter_by(
+            bucket=values['bucket'],
+            product_name=values['product_name'],
+            language=values['language'],
+            sentiment=values['sentiment']
+        ).with_for_update().first()
+        if row is None:
+            session.add(SentimentRollup(**values))
+        else:
+            row.review_count += values['review_count']
+            row.confidence_sum += values['confidence_sum']
+        return
+
+    statement = insert(SentimentRollup).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=['bucket', 'product_name', 'language', 'sentiment'],
+        set_={
+            'review_count': SentimentRollup.review_count + statement.excluded.review_count,
+            'confidence_sum': SentimentRollup.confidence_sum + statement.excluded.confidence_sum,
+        }
+    )
+    session.execute(statement)
+
+
+def rollup_key(review):
+    return (
+        day_bucket(review.created_at),
+        review.product_name or '',
+        review.language or 'id',
+        review.sentiment,
+    )
+
+
+def record_reviews(session, reviews):
+    """Add flushed reviews to the rollups; call before the session commits"""
+    totals = defaultdict(lambda: [0, 0.0])
+    for review in reviews:
+        total = totals[rollup_key(review)]
+        total[0] += 1
+        total[1] += review.confidence_score or 0.0
+
+    for (bucket, product_name, language, sentiment), (count, confidence_sum) in totals.items():
+        _upsert(session, {
+            'bucket': bucket,
+            'product_name': product_name,
+            'language': language,
+            'sentiment': sentiment,
+            'review_count': count,
+            'confidence_sum': confidence_sum,
+        })
+
+
+def rebuild_rollups(chunk_rows=5000):
+    """Recompute every rollup row from the reviews table"""
+    from models import Session, Review, SentimentRollup
+
+    session = Session()
+    try:
+        totals = defaultdict(lambda: [0, 0.0])
+        query = (
+            session.query(Review.created_at, Review.product_name, Review.language,
+                          Review.sentiment, Review.confidence_score)
+            .execution_options(stream_results=True)
+            .yield_per(chunk_rows)
+        )
+        scanned = 0
+        for row in query:
+            total = totals[rollup_key(row)]
+            total[0] += 1
+            total[1] += row.confidence_score or 0.0
+            scanned += 1
+
+        session.query(SentimentRollup).delete()
+        session.bulk_insert_mappings(SentimentRollup, [
+            {
+                'bucket': bucket,
+                'product_name': product_name,
+                'language': language,
+                'sentiment': sentiment,
+                'review_count': count,
+                'confidence_sum': confidence_sum,
+            }
+            for (bucket, product_name, language, sentiment), (count, confidence_sum) in totals.items()
+        ])
+        session.commit()
+        logger.info(f"Rebuilt {len(totals)} rollup rows from {scanned} reviews")
+        return {'reviews': scanned, 'rollups': len(totals)}
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def trend_bucket(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _summary():
+    return {'count': 0, 'confidence_sum': 0.0, 'sentiments': defaultdict(int)}
+
+
+def _finish(summary):
+    count = summary['count']
+    return {
+        'count': count,
+        'mean_confidence': round(summary['confidence_sum'] / count, 4) if count else None,
+        'sentiments': dict(summary['sentiments']),
+    }
+
+
+def query_stats(session, product_name=None, language=None, sentiment=None,
+                date_from=None, date_to=None, bucket='day'):
+    """Totals, per product/language/sentiment breakdowns and a time trend"""
+    from models import SentimentRollup
+
+    query = session.query(SentimentRollup)
+    if product_name is not None:
+        query = query.filter(SentimentRollup.product_name == product_name)
+    if language:
+        query = query.filter(SentimentRollup.language == language)
+    if sentiment:
+        query = query.filter(SentimentRollup.sentiment == sentiment)
+    if date_from:
+        query = query.filter(SentimentRollup.bucket >= day_bucket(date_from))
+    if date_to:
+        query = query.filter(SentimentRollup.bucket <= date_to)
+
+    total = _summary()
+    by_product = defaultdict(_summary)
+    by_language = defaultdict(_summary)
+    trend = defaultdict(_summary)
+    for row in query:
+        for summary in (total, by_product[row.product_name], by_language[row.language],
+                        trend[trend_bucket(row.bucket, bucket)]):
+            summary['count'] += row.review_count
+            summary['confidence_sum'] += row.confidence_sum
+            summary['sentiments'][row.sentiment] += row.review_count
+
+    return {
+        'total': _finish(total),
+        'by_product': [
+            dict(_finish(summary), product_name=name or None)
+            for name, summary in sorted(by_product.items())
+        ],
+        'by_language': [
+            dict(_finish(summary), language=name)
+            for name, summary in sorted(by_language.items())
+        ],
+        'trend': [
+            dict(_finish(summary), bucket=day.date().isoformat())
+            for day, summary in sorted(trend.items())
+        ],
+        'bucket': bucket,
+    }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) != 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python sentiment_stats.py rebuild")
+        sys.exit(1)
+    print(rebuild_rollups())
@@ -1,23 +1,116 @@
 from pyramid.view import view_config
 from pyramid.response import Response
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError  # re-raised so db_session answers 503
+import base64
+import csv
+from datetime import datetime
+import hashlib
+import io
 import json
+import os
 import logging
+import threading
 import traceback
 
+from dedup import DEDUP_ENABLED, find_duplicate, index_reviews
+from http_encoding import not_modified, set_validators
+import language_id
+import metrics
+from metrics import stage
+from product_summary import record_key_points
+
 logger = logging.getLogger(__name__)
 
+# Upper bound of reviews accepted by one POST /api/analyze-reviews call
+MAX_BATCH_REVIEWS = int(os.getenv('MAX_BATCH_REVIEWS', '500'))
+
+# Async key points extraction (POST /api/analyze-review?async=true)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+JOB_BACKOFF_BASE = float(os.getenv('JOB_BACKOFF_BASE', '2.0'))
+PARTITION_CHECK_INTERVAL = float(os.getenv('PARTITION_CHECK_INTERVAL', '3600'))
+
+# Page size of GET /api/reviews
+REVIEWS_PAGE_SIZE = int(os.getenv('REVIEWS_PAGE_SIZE', '50'))
+REVIEWS_MAX_PAGE_SIZE = int(os.getenv('REVIEWS_MAX_PAGE_SIZE', '500'))
+
+# Rows fetched per round trip and written per chunk by GET /api/reviews/export
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', '1000'))
+
+# Coalesce concurrent single-review requests into batched forward passes
+SCHEDULER_ENABLED = os.getenv('SENTIMENT_SCHEDULER_ENABLED', 'true').lower() == 'true'
+SCHEDULER_MAX_BATCH_SIZE = int(os.getenv('SENTIMENT_SCHEDULER_MAX_BATCH_SIZE', '16'))
+SCHEDULER_MAX_WAIT_MS = float(os.getenv('SENTIMENT_SCHEDULER_MAX_WAIT_MS', '5'))
+
+# Process pool execution: SENTIMENT_PROCESSES > 0 runs that many inference
+# workers forked from a forkserver holding the model; SENTIMENT_TORCH_THREADS
+# is per worker
+SENTIMENT_PROCESSES = int(os.getenv('SENTIMENT_PROCESSES', '0'))
+SENTIMENT_TORCH_THREADS = int(os.getenv('SENTIMENT_TORCH_THREADS', '0')) or None
+
+# Local language detection of review_text (language_id.py): 'override' uses the
+# detected id/en over the client's language when confident, 'fallback' only
+# when the client sends no language (or 'auto'), 'off' trusts the client
+LANGUAGE_DETECTION = os.getenv('LANGUAGE_DETECTION', 'override').lower()
+
+# Content-addressed cache for sentiment results and Gemini key points
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '10000'))
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))
+RESULT_CACHE_PERSISTENT = os.getenv('RESULT_CACHE_PERSISTENT', 'false').lower() == 'true'
+RESULT_CACHE_PERSISTENT_MAX_ROWS = int(os.getenv('RESULT_CACHE_PERSISTENT_MAX_ROWS', '100000'))
+
 # Initialize analyzers globally (loaded once at startup)
 sentiment_analyzer = None
 gemini_analyzer = None
+result_cache = None
+job_pool = None
+warmup_state = {'started': False, 'done': False, 'sentiment': False, 'gemini': False, 'errors': {}}
+_analyzer_lock = threading.Lock()
+
+def wrap_sentiment_analyzer(analyzer, processes=0):
+    """Put the configured inference scheduler around an analyzer"""
+    if SCHEDULER_ENABLED:
+        from inference_scheduler import InferenceScheduler
+        analyzer = InferenceScheduler(
+            analyzer,
+            max_batch_size=SCHEDULER_MAX_BATCH_SIZE,
+            max_wait_ms=SCHEDULER_MAX_WAIT_MS,
+            num_workers=max(1, processes)
+        )
+    return analyzer
+
+def load_sentiment_analyzer(model_name=None):
+    """
+    The analyzer for `model_name` (None: the multilingual model) with the
+    configured process pool and inference scheduler. With a process pool the
+    model is only loaded by the pool, never in this process
+    """
+    if SENTIMENT_PROCESSES > 0:
+        import multiprocessing
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            from inference_pool import ProcessPoolSentimentAnalyzer
+            pool = ProcessPoolSentimentAnalyzer(
+                model_name,
+                num_workers=SENTIMENT_PROCESSES,
+                torch_threads=SENTIMENT_TORCH_THREADS
+            )
+            return wrap_sentiment_analyzer(pool, processes=SENTIMENT_PROCESSES)
+        logger.warning("SENTIMENT_PROCESSES needs the forkserver start method, running in-process")
+    from sentiment_analyzer import SentimentAnalyzer
+    return wrap_sentiment_analyzer(SentimentAnalyzer(model_name=model_name))
 
 def get_sentiment_analyzer():
-    """Lazy load sentiment analyzer"""
+    """Lazy load sentiment analyzer (wrapped by the inference scheduler when enabled)"""
     global sentiment_analyzer
     if sentiment_analyzer is None:
-        logger.info("Loading sentiment analyzer...")
-        from sentiment_analyzer import SentimentAnalyzer
-        sentiment_analyzer = SentimentAnalyzer()
-        logger.info("Sentiment analyzer loaded successfully")
+        with _analyzer_lock:
+            if sentiment_analyzer is None:
+                logger.info("Loading sentiment analyzer...")
+                from language_router import build_sentiment_analyzer
+                sentiment_analyzer = build_sentiment_analyzer(load=load_sentiment_analyzer)
+                logger.info("Sentiment analyzer loaded successfully")
     return sentiment_analyzer
 
 def get_gemini_analyzer():
@@ -30,6 +123,327 @@ def get_gemini_analyzer():
         logger.info("Gemini analyzer loaded successfully")
     return gemini_analyzer
 
+def warmup_analyzers():
+    """
+    Load both analyzers and run one inference so the first real request does not
+    pay for imports, model loading and lazy kernel initialisation.
+    """
+    import time
+    warmup_state['started'] = True
+    started = time.monotonic()
+
+    try:
+        analyzer = get_sentiment_analyzer()
+        analyzer.analyze_batch(["Produk ini bagus, pengiriman cepat.", "This product is fine."])
+        warmup_state['sentiment'] = True
+    except Exception as e:
+        logger.error(f"Sentiment analyzer warmup failed: {e}")
+        warmup_state['errors']['sentiment'] = str(e)
+
+    try:
+        get_gemini_analyzer()
+        warmup_state['gemini'] = True
+    except Exception as e:
+        logger.error(f"Gemini analyzer warmup failed: {e}")
+        warmup_state['errors']['gemini'] = str(e)
+
+    warmup_state['seconds'] = round(time.monotonic() - started, 2)
+    warmup_state['done'] = True
+    logger.info(f"Warmup finished in {warmup_state['seconds']}s")
+
+def start_warmup():
+    """Warm the analyzers in a background thread while the server starts listening"""
+    # Set before the thread runs, so /ready never reports ready in between
+    warmup_state['started'] = True
+    thread = threading.Thread(target=warmup_analyzers, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+def get_result_cache():
+    """Lazy create the result cache, None when disabled"""
+    global result_cache
+    if result_cache is None and RESULT_CACHE_ENABLED:
+        from result_cache import ResultCache
+        result_cache = ResultCache(
+            max_size=RESULT_CACHE_SIZE,
+            ttl_seconds=RESULT_CACHE_TTL,
+            persistent=RESULT_CACHE_PERSISTENT,
+            persistent_max_rows=RESULT_CACHE_PERSISTENT_MAX_ROWS
+        )
+    return result_cache
+
+def analyze_sentiment_cached(review_text, language):
+    """Sentiment for one text, skipping the forward pass on a cache hit"""
+    analyzer = get_sentiment_analyzer()
+    cache = get_result_cache()
+    model_id = getattr(analyzer, 'model_id', None)
+    if cache:
+        cached = cache.get('sentiment', model_id, language, review_text)
+        if cached is not None:
+            logger.info("Sentiment served from cache")
+            return cached
+
+    sentiment_result = analyzer.analyze(review_text)
+    # The neutral fallback of a failed forward pass must not outlive the error
+    if cache and not sentiment_result.get('error'):
+        cache.set('sentiment', model_id, language, review_text, sentiment_result)
+    return sentiment_result
+
+def analyze_sentiment_batch_cached(items):
+    """
+    Sentiment for a list of (review_text, language); only cache misses
+    go through analyze_batch. Keeps input order, None marks a failed item
+    """
+    analyzer = get_sentiment_analyzer()
+    cache = get_result_cache()
+    model_id = getattr(analyzer, 'model_id', None)
+
+    results = [None] * len(items)
+    misses = []
+    for position, (review_text, language) in enumerate(items):
+        cached = cache.get('sentiment', model_id, language, review_text) if cache else None
+        if cached is not None:
+            results[position] = cached
+        else:
+            misses.append(position)
+
+    if misses:
+        analyzed = analyzer.analyze_batch([items[position][0] for position in misses])
+        for position, sentiment_result in zip(misses, analyzed):
+            results[position] = sentiment_result
+            if cache and sentiment_result is not None and not sentiment_result.get('error'):
+                review_text, language = items[position]
+                cache.set('sentiment', model_id, language, review_text, sentiment_result)
+    return results
+
+def extract_key_points_cached(gemini, review_text, language):
+    """Gemini key points for one text, skipping the remote call on a cache hit"""
+    cache = get_result_cache()
+    model_id = getattr(gemini, 'model_name', None)
+    if cache:
+        cached = cache.get('key_points', model_id, language, review_text)
+        if cached is not None:
+            logger.info("Key points served from cache")
+            return cached
+
+    key_points = gemini.extract_key_points(review_text, language=language)
+    # Never cache the "unable to extract" placeholder
+    if cache and key_points and key_points != fallback_key_points(language):
+        cache.set('key_points', model_id, language, review_text, key_points)
+    return key_points
+
+def extract_key_points_batch_cached(gemini, items):
+    """
+    Key points for a list of (review_text, language); cache misses are sent
+    to Gemini as batched prompts. Keeps input order
+    """
+    cache = get_result_cache()
+    model_id = getattr(gemini, 'model_name', None)
+
+    results = [None] * len(items)
+    misses = []
+    for position, (review_text, language) in enumerate(items):
+        cached = cache.get('key_points', model_id, language, review_text) if cache else None
+        if cached is not None:
+            results[position] = cached
+        else:
+            misses.append(position)
+
+    if misses:
+        extracted = gemini.extract_key_points_batch([items[position] for position in misses])
+        for position, key_points in zip(misses, extracted):
+            review_text, language = items[position]
+            results[position] = key_points or fallback_key_points(language)
+            if cache and key_points and key_points != fallback_key_points(language):
+                cache.set('key_points', model_id, language, review_text, key_points)
+    return results
+
+def extract_key_points_for_job(review):
+    """Job handler: raise on the placeholder answer so the job is retried"""
+    language = review.language or 'id'
+    gemini = get_gemini_analyzer()
+    key_points = extract_key_points_cached(gemini, review.review_text, language)
+    if not key_points or key_points == fallback_key_points(language):
+        raise RuntimeError('Gemini key points extraction failed')
+    return key_points
+
+def get_job_pool():
+    """Lazy create the background job worker pool"""
+    global job_pool
+    if job_pool is None:
+        with _analyzer_lock:
+            if job_pool is None:
+                from job_queue import JobWorkerPool
+                job_pool = JobWorkerPool(
+                    extract_key_points_for_job,
+                    on_give_up=lambda review: fallback_key_points(review.language or 'id'),
+                    on_done=lambda session, review: record_key_points(session, [review]),
+                    num_workers=JOB_WORKERS,
+                    poll_interval=JOB_POLL_INTERVAL,
+                    backoff_base=JOB_BACKOFF_BASE,
+                    maintenance=ensure_review_partitions,
+                    maintenance_interval=PARTITION_CHECK_INTERVAL
+                )
+    return job_pool
+
+def ensure_review_partitions():
+    """Keep next months' review partitions in place in long-running processes"""
+    from models import engine
+    from retention import ensure_partitions
+    ensure_partitions(engine)
+
+def start_job_workers():
+    """Start draining queued jobs (also the ones left over from a previous run)"""
+    if JOB_WORKERS > 0:
+        get_job_pool().start()
+
+def is_truthy(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
+def save_reviews(session, reviews):
+    """
+    Add new reviews and commit them together with the rows derived from them
+    (sentiment rollups, aspect counters, duplicate index). Every write path of
+    a Review goes through here.
+    """
+    from models import bump_version
+    from sentiment_stats import record_reviews
+    with stage('db_commit'):
+        session.add_all(reviews)
+        session.flush()  # assigns id and created_at
+        record_reviews(session, reviews)
+        record_key_points(session, reviews)
+        if DEDUP_ENABLED:
+            # Duplicates point at their original, only originals are indexed
+            index_reviews(session, [
+                (review.id, review.review_text) for review in reviews if review.duplicate_of is None
+            ])
+        bump_version(session)
+        session.commit()
+
+def copy_duplicate(session, fields):
+    """
+    Save `fields` as a copy of the analysis of a stored near-duplicate.
+    Returns the new review, or None when there is no duplicate (or the lookup fails).
+    """
+    from models import Review
+    try:
+        with stage('dedup'):
+            original = find_duplicate(session, fields['review_text'], fields['language'])
+        if original is None:
+            return None
+        review = Review(
+            product_name=fields['product_name'],
+            language=fields['language'],
+            review_text=fields['review_text'],
+            sentiment=original.sentiment,
+            confidence_score=original.confidence_score,
+            sentiment_tier=original.sentiment_tier,
+            key_points=original.key_points,
+            duplicate_of=original.id
+        )
+        save_reviews(session, [review])
+        return review
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Duplicate lookup failed, analyzing normally: {e}")
+        return None
+
+def save_analyzed_review(session, fields, sentiment_result, key_points=None, queue_key_points=False):
+    """
+    Save one analyzed review, with its key points job when `queue_key_points`
+    (async mode). Shared by the WSGI views and asgi.py.
+    Returns: (review, job), job is None unless queued
+    """
+    from models import Review
+    review = Review(
+        product_name=fields['product_name'],
+        language=fields['language'],
+        review_text=fields['review_text'],
+        sentiment=sentiment_result['sentiment'],
+        confidence_score=sentiment_result['confidence_score'],
+        sentiment_tier=sentiment_result.get('tier'),
+        key_points=None if queue_key_points else key_points
+    )
+    job = None
+    if queue_key_points:
+        from job_queue import enqueue_key_points
+        job = enqueue_key_points(session, review, max_attempts=JOB_MAX_ATTEMPTS)
+    save_reviews(session, [review])
+    return review, job
+
+def queued_review_body(review, job, status_url):
+    """Response body of an async analyze request (HTTP 202)"""
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'review': review.to_dict()
+    }
+
+def notify_job_workers():
+    """Wake the job workers after a job was committed"""
+    if JOB_WORKERS > 0:
+        pool = get_job_pool()
+        pool.start()
+        pool.notify()
+
+def error_response(message, status):
+    """JSON error body with the given HTTP status"""
+    return Response(
+        json.dumps({'error': message}),
+        status=status,
+        content_type='application/json; charset=utf-8'
+    )
+
+def parse_review_input(data):
+    """
+    Validate one review payload
+    Returns: (fields, None) when valid or (None, error message) when not
+    """
+    if not isinstance(data, dict):
+        return None, 'Format JSON tidak valid'
+    # Numbers, lists, ... are a per-item validation error, not a crash of the whole request
+    for key in ('review_text', 'product_name', 'language'):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            return None, 'Format JSON tidak valid'
+
+    review_text = (data.get('review_text') or '').strip()
+    product_name = (data.get('product_name') or '').strip()
+    language = (data.get('language') or '').strip().lower()
+    if language not in language_id.LANGUAGES:
+        language = None
+
+    if not review_text:
+        return None, 'Teks review wajib diisi'
+
+    if len(review_text) < 10:
+        return None, 'Teks review terlalu pendek (minimal 10 karakter)'
+
+    # reviews.product_name is a VARCHAR(255); longer names would fail the whole insert
+    if len(product_name) > 255:
+        return None, 'Nama produk terlalu panjang (maksimal 255 karakter)'
+
+    # The language picks the Gemini prompt, so detect it from the text itself
+    if LANGUAGE_DETECTION == 'override' or (LANGUAGE_DETECTION == 'fallback' and language is None):
+        detected, confidence = language_id.detect(review_text)
+        if metrics.ENABLED:
+            metrics.LANGUAGE_DETECTIONS.inc(detected)
+        if detected in language_id.LANGUAGES and confidence >= language_id.MIN_CONFIDENCE:
+            language = detected
+    language = language or 'id'
+
+    return {
+        'review_text': review_text,
+        'product_name': product_name if product_name else None,
+        'language': language,
+    }, None
+
+def fallback_key_points(language):
+    return "- Tidak bisa ekstrak poin penting saat ini" if language == 'id' else "- Unable to extract key points at this time"
+
 @view_config(route_name='analyze_review', renderer='json', request_method='POST')
 def analyze_review(request):
     """
@@ -44,126 +458,645 @@ def analyze_review(request):
             data = request.json_body
         except Exception as e:
             logger.error(f"Failed to parse JSON: {e}")
-            return Response(
-                json.dumps({'error': 'Format JSON tidak valid'}),
-                status=400,
-                content_type='application/json; charset=utf-8'
-            )
+            return error_response('Format JSON tidak valid', 400)
         
-        review_text = data.get('review_text', '').strip()
-        product_name = data.get('product_name', '').strip()
-        language = data.get('language', 'id').strip().lower()
-        if language not in ('id', 'en'):
-            language = 'id'
+        fields, error = parse_review_input(data)
+        if error:
+            return error_response(error, 400)
+
+        review_text = fields['review_text']
+        language = fields['language']
         logger.info(f"Review text length: {len(review_text)}")
-        
-        if not review_text:
-            return Response(
-                json.dumps({'error': 'Teks review wajib diisi'}),
-                status=400,
-                content_type='application/json; charset=utf-8'
-            )
-        
-        if len(review_text) < 10:
-            return Response(
-                json.dumps({'error': 'Teks review terlalu pendek (minimal 10 karakter)'}),
-                status=400,
-                content_type='application/json; charset=utf-8'
-            )
+
+        # Near-duplicate of a stored review (spam with small edits): reuse its analysis
+        if DEDUP_ENABLED:
+            duplicate = copy_duplicate(request.dbsession, fields)
+            if duplicate is not None:
+                logger.info(f"Review saved with ID: {duplicate.id} (duplicate of {duplicate.duplicate_of})")
+                return duplicate.to_dict()
         
         # Analyze sentiment
         logger.info("Starting sentiment analysis...")
         try:
-            analyzer = get_sentiment_analyzer()
-            sentiment_result = analyzer.analyze(review_text)
+            with stage('sentiment'):
+                sentiment_result = analyze_sentiment_cached(review_text, language)
             logger.info(f"Sentiment: {sentiment_result}")
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {e}")
             logger.error(traceback.format_exc())
-            return Response(
-                json.dumps({'error': 'Analisis sentimen gagal. Coba lagi.'}),
-                status=500,
-                content_type='application/json; charset=utf-8'
-            )
+            return error_response('Analisis sentimen gagal. Coba lagi.', 500)
         
+        # Async mode: save now, key points are filled in by the job workers
+        if is_truthy(request.params.get('async', data.get('async', False))):
+            return save_review_async(request, fields, sentiment_result)
+
         # Extract key points with Gemini
         logger.info("Starting key points extraction...")
         try:
             gemini = get_gemini_analyzer()
-            key_points = gemini.extract_key_points(review_text, language=language)
+            with stage('key_points'):
+                key_points = extract_key_points_cached(gemini, review_text, language)
             logger.info("Key points extracted successfully")
         except Exception as e:
             logger.error(f"Gemini analysis failed: {e}")
             logger.error(traceback.format_exc())
             # Continue with partial results
-            key_points = "- Tidak bisa ekstrak poin penting saat ini" if language == 'id' else "- Unable to extract key points at this time"
+            key_points = fallback_key_points(language)
         
         # Save to database
         logger.info("Saving to database...")
         try:
-            from models import Session, Review
-            session = Session()
-            review = Review(
-                product_name=product_name if product_name else None,
-                language=language,
-                review_text=review_text,
-                sentiment=sentiment_result['sentiment'],
-                confidence_score=sentiment_result['confidence_score'],
-                key_points=key_points
-            )
-            session.add(review)
-            session.commit()
+            review, _ = save_analyzed_review(request.dbsession, fields, sentiment_result, key_points)
             
             result = review.to_dict()
-            session.close()
             
             logger.info(f"Review saved with ID: {result['id']}")
             return result
             
+        except PoolTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Database error: {e}")
             logger.error(traceback.format_exc())
-            return Response(
-                json.dumps({'error': 'Gagal menyimpan review ke database'}),
-                status=500,
-                content_type='application/json; charset=utf-8'
-            )
+            return error_response('Gagal menyimpan review ke database', 500)
         
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in analyze_review: {e}")
         logger.error(traceback.format_exc())
-        return Response(
-            json.dumps({'error': 'Error server. Coba lagi nanti.'}),
-            status=500,
-            content_type='application/json; charset=utf-8'
-        )
+        return error_response('Error server. Coba lagi nanti.', 500)
+
+def save_review_async(request, fields, sentiment_result):
+    """Save the review without key points plus its job, reply 202 with the job id"""
+    session = request.dbsession
+    try:
+        review, job = save_analyzed_review(session, fields, sentiment_result, queue_key_points=True)
+        body = queued_review_body(review, job, request.route_path('get_job', id=job.id))
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Database error: {e}")
+        logger.error(traceback.format_exc())
+        return error_response('Gagal menyimpan review ke database', 500)
+
+    notify_job_workers()
+    logger.info(f"Review {body['review']['id']} saved, key points queued as job {body['job_id']}")
+    request.response.status = 202
+    return body
+
+@view_config(route_name='get_job', renderer='json', request_method='GET')
+def get_job(request):
+    """
+    GET /api/jobs/{id}
+    Status of an async key points job; includes the review once it is done
+    """
+    from models import AnalysisJob
+    try:
+        job_id = int(request.matchdict['id'])
+    except ValueError:
+        return error_response('ID job tidak valid', 400)
+
+    job = request.dbsession.get(AnalysisJob, job_id)
+    if job is None:
+        return error_response('Job tidak ditemukan', 404)
+    result = job.to_dict()
+    if job.status in ('done', 'failed') and job.review is not None:
+        result['review'] = job.review.to_dict()
+    return result
+
+@view_config(route_name='analyze_reviews', renderer='json', request_method='POST')
+def analyze_reviews(request):
+    """
+    POST /api/analyze-reviews
+    Body: { "reviews": [{ "product_name": "...", "review_text": "...", "language": "id" }, ...],
+            "extract_key_points": true }
+    Sentiment runs in padded micro-batches; results keep input order and
+    invalid or failed items are reported per item instead of failing the batch.
+    """
+    try:
+        try:
+            data = request.json_body
+        except Exception as e:
+            logger.error(f"Failed to parse JSON: {e}")
+            return error_response('Format JSON tidak valid', 400)
+
+        items = data.get('reviews') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return error_response('Daftar reviews wajib diisi', 400)
+        if len(items) > MAX_BATCH_REVIEWS:
+            return error_response(f'Maksimal {MAX_BATCH_REVIEWS} reviews per request', 400)
+        with_key_points = bool(data.get('extract_key_points', True))
+        logger.info(f"Received batch analyze request with {len(items)} reviews")
+
+        results = [None] * len(items)
+        valid = []  # (index, fields)
+        for index, item in enumerate(items):
+            fields, error = parse_review_input(item)
+            if error:
+                results[index] = {'index': index, 'error': error}
+            else:
+                valid.append((index, fields))
+
+        # Analyze sentiment in micro-batches
+        sentiments = []
+        if valid:
+            try:
+                with stage('sentiment_batch'):
+                    sentiments = analyze_sentiment_batch_cached(
+                        [(fields['review_text'], fields['language']) for _, fields in valid]
+                    )
+            except Exception as e:
+                logger.error(f"Batch sentiment analysis failed: {e}")
+                logger.error(traceback.format_exc())
+                return error_response('Analisis sentimen gagal. Coba lagi.', 500)
+
+        # Extract key points and build rows
+        from models import Review
+        gemini = None
+        if with_key_points and valid:
+            try:
+                gemini = get_gemini_analyzer()
+            except Exception as e:
+                logger.error(f"Gemini analyzer unavailable: {e}")
+
+        analyzed = [
+            (index, fields, sentiment_result)
+            for (index, fields), sentiment_result in zip(valid, sentiments)
+            if sentiment_result is not None
+        ]
+        for (index, fields), sentiment_result in zip(valid, sentiments):
+            if sentiment_result is None:
+                results[index] = {'index': index, 'error': 'Analisis sentimen gagal'}
+
+        # Key points for the whole batch with packed multi-review prompts
+        key_points_list = [None] * len(analyzed)
+        if with_key_points and analyzed:
+            try:
+                if gemini is None:
+                    raise RuntimeError('Gemini analyzer unavailable')
+                with stage('key_points_batch'):
+                    key_points_list = extract_key_points_batch_cached(
+                        gemini, [(fields['review_text'], fields['language']) for _, fields, _ in analyzed]
+                    )
+            except Exception as e:
+                logger.error(f"Batched Gemini analysis failed: {e}")
+                key_points_list = [fallback_key_points(fields['language']) for _, fields, _ in analyzed]
+
+        pending = []  # (index, review)
+        for (index, fields, sentiment_result), key_points in zip(analyzed, key_points_list):
+            pending.append((index, Review(
+                product_name=fields['product_name'],
+                language=fields['language'],
+                review_text=fields['review_text'],
+                sentiment=sentiment_result['sentiment'],
+                confidence_score=sentiment_result['confidence_score'],
+                sentiment_tier=sentiment_result.get('tier'),
+                key_points=key_points
+            )))
+
+        # Save all rows with a single commit
+        if pending:
+            session = request.dbsession
+            try:
+                save_reviews(session, [review for _, review in pending])
+                for index, review in pending:
+                    results[index] = {'index': index, 'review': review.to_dict()}
+            except PoolTimeoutError:
+                raise
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Database error: {e}")
+                logger.error(traceback.format_exc())
+                for index, _ in pending:
+                    results[index] = {'index': index, 'error': 'Gagal menyimpan review ke database'}
+
+        failed = sum(1 for item in results if 'error' in item)
+        logger.info(f"Batch finished: {len(results) - failed} saved, {failed} failed")
+        return {
+            'results': results,
+            'total': len(results),
+            'succeeded': len(results) - failed,
+            'failed': failed
+        }
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in analyze_reviews: {e}")
+        logger.error(traceback.format_exc())
+        return error_response('Error server. Coba lagi nanti.', 500)
+
+def encode_cursor(created_at, review_id):
+    raw = json.dumps([created_at.isoformat() if created_at else None, review_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, review_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    return (datetime.fromisoformat(created_at) if created_at else None), int(review_id)
+
+def parse_date_param(value, end_of_day=False):
+    """Accept YYYY-MM-DD or a full ISO timestamp"""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return parsed
+
+def apply_review_filters(query, params, date_from=None, date_to=None):
+    """Filters shared by the listing and export endpoints"""
+    from models import Review
+    if params.get('sentiment'):
+        query = query.filter(Review.sentiment == params['sentiment'])
+    if params.get('product_name'):
+        query = query.filter(Review.product_name == params['product_name'])
+    if params.get('language'):
+        query = query.filter(Review.language == params['language'])
+    if date_from:
+        query = query.filter(Review.created_at >= date_from)
+    if date_to:
+        query = query.filter(Review.created_at <= date_to)
+    return query
+
+def reviews_validators(session, query_string):
+    """
+    (ETag, Last-Modified) for a review listing: the query string and the
+    reviews change counter, bumped by every write (new reviews, filled in key
+    points, duplicate links, archive and restore), so it costs one primary key
+    lookup instead of a scan of the filtered rows
+    """
+    from models import data_version
+    version, updated_at = data_version(session)
+    raw = json.dumps([query_string, version])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24], updated_at
 
 @view_config(route_name='get_reviews', renderer='json', request_method='GET')
 def get_reviews(request):
     """
     GET /api/reviews
-    Returns all reviews from database
+    Query: limit, cursor, sentiment, product_name, language, date_from, date_to, fields
+    Returns one page of reviews (newest first). The cursor for the next page is
+    sent in the X-Next-Cursor header; it is absent on the last page.
     """
     try:
-        logger.info("Fetching all reviews...")
-        from models import Session, Review
-        
-        session = Session()
-        reviews = session.query(Review).order_by(Review.created_at.desc()).all()
-        result = [review.to_dict() for review in reviews]
-        session.close()
-        
+        logger.info("Fetching reviews page...")
+        from models import Review
+        from sqlalchemy import and_, or_
+
+        params = request.params
+        try:
+            limit = int(params.get('limit', REVIEWS_PAGE_SIZE))
+            if limit < 1:
+                raise ValueError('limit')
+            limit = min(limit, REVIEWS_MAX_PAGE_SIZE)
+
+            fields = list(Review.FIELDS)
+            if params.get('fields'):
+                fields = [field.strip() for field in params['fields'].split(',') if field.strip()]
+                unknown = [field for field in fields if field not in Review.FIELDS]
+                if unknown or not fields:
+                    raise ValueError('fields')
+
+            cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+            date_from = parse_date_param(params['date_from']) if params.get('date_from') else None
+            date_to = parse_date_param(params['date_to'], end_of_day=True) if params.get('date_to') else None
+        except Exception:
+            return error_response('Parameter query tidak valid', 400)
+
+        # Cheap validators first: an unchanged listing is answered with 304
+        # before any row is loaded
+        etag, last_modified = reviews_validators(request.dbsession, request.query_string)
+        if not_modified(request, etag, last_modified):
+            response = Response(status=304)
+            set_validators(response, etag, last_modified)
+            return response
+        set_validators(request.response, etag, last_modified)
+
+        # Keyset columns are always loaded, even when not requested
+        columns = list(dict.fromkeys(fields + ['created_at', 'id']))
+
+        query = request.dbsession.query(*[getattr(Review, column) for column in columns])
+        query = apply_review_filters(query, params, date_from, date_to)
+        if cursor:
+            cursor_created_at, cursor_id = cursor
+            query = query.filter(or_(
+                Review.created_at < cursor_created_at,
+                and_(Review.created_at == cursor_created_at, Review.id < cursor_id)
+            ))
+
+        rows = (
+            query.order_by(Review.created_at.desc(), Review.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        result = [Review.row_to_dict(row, fields) for row in rows]
+        if has_more:
+            last = rows[-1]
+            request.response.headers['X-Next-Cursor'] = encode_cursor(last.created_at, last.id)
+
         logger.info(f"Returned {len(result)} reviews")
         return result
         
+    except PoolTimeoutError:
+        raise
     except Exception as e:
         logger.error(f"Error in get_reviews: {e}")
         logger.error(traceback.format_exc())
-        return Response(
-            json.dumps({'error': 'Gagal mengambil data reviews'}),
-            status=500,
-            content_type='application/json; charset=utf-8'
+        return error_response('Gagal mengambil data reviews', 500)
+
+@view_config(route_name='search_reviews', renderer='json', request_method='GET')
+def search_reviews(request):
+    """
+    GET /api/reviews/search
+    Query: q, page, limit, sentiment, product_name, language, date_from, date_to
+    Full-text search over review text, key points and product name, best
+    matches first. Each result is a review plus its relevance `score`.
+    """
+    try:
+        import search_index
+        from models import Review
+
+        params = request.params
+        q = (params.get('q') or '').strip()
+        if not search_index.terms(q):
+            return error_response('Kata kunci pencarian wajib diisi', 400)
+        try:
+            limit = int(params.get('limit', REVIEWS_PAGE_SIZE))
+            page = int(params.get('page', 1))
+            if limit < 1 or page < 1:
+                raise ValueError('page')
+            limit = min(limit, REVIEWS_MAX_PAGE_SIZE)
+            date_from = parse_date_param(params['date_from']) if params.get('date_from') else None
+            date_to = parse_date_param(params['date_to'], end_of_day=True) if params.get('date_to') else None
+        except Exception:
+            return error_response('Parameter query tidak valid', 400)
+
+        logger.info(f"Searching reviews for {q!r}, page {page}")
+        query = search_index.search_query(request.dbsession, q)
+        query = apply_review_filters(query, params, date_from, date_to)
+        rows = (
+            query.order_by(Review.id.desc())
+            .offset((page - 1) * limit)
+            .limit(limit + 1)
+            .all()
+        )
+
+        results = []
+        for review, score in rows[:limit]:
+            item = review.to_dict()
+            item['score'] = float(score or 0.0)
+            results.append(item)
+        return {
+            'query': q,
+            'page': page,
+            'limit': limit,
+            'has_more': len(rows) > limit,
+            'results': results
+        }
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in search_reviews: {e}")
+        logger.error(traceback.format_exc())
+        return error_response('Gagal mencari reviews', 500)
+
+def iter_review_export(params, export_format, date_from=None, date_to=None):
+    """
+    Yield the export body in chunks of EXPORT_CHUNK_ROWS rows. Rows are read with
+    yield_per + stream_results (server-side cursor on Postgres), so memory stays
+    flat regardless of table size. The session lives as long as the iterator.
+    A failure mid-stream ends the body with an error record and then aborts the
+    connection, so a truncated export never looks complete.
+    """
+    from models import Session, Review
+
+    session = Session()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    lines = []
+    try:
+        query = apply_review_filters(session.query(Review), params, date_from, date_to)
+        query = query.order_by(Review.id).execution_options(stream_results=True).yield_per(EXPORT_CHUNK_ROWS)
+
+        if export_format == 'csv':
+            writer.writerow(Review.FIELDS)
+            count = 0
+            for review in query:
+                row = review.to_dict()
+                writer.writerow([row[field] for field in Review.FIELDS])
+                count += 1
+                if count % EXPORT_CHUNK_ROWS == 0:
+                    yield buffer.getvalue().encode('utf-8')
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode('utf-8')
+        else:
+            for review in query:
+                lines.append(json.dumps(review.to_dict(), ensure_ascii=False))
+                if len(lines) >= EXPORT_CHUNK_ROWS:
+                    yield ('\n'.join(lines) + '\n').encode('utf-8')
+                    lines = []
+            if lines:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+    except Exception as e:
+        logger.error(f"Export stream failed: {e}")
+        logger.error(traceback.format_exc())
+        # Headers are already sent: finish with an error record (after the
+        # complete rows still buffered), then re-raise so the server drops the
+        # connection instead of ending the response cleanly
+        message = 'Export gagal, data tidak lengkap'
+        if export_format == 'csv':
+            writer.writerow(['#error', message])
+            yield buffer.getvalue().encode('utf-8')
+        else:
+            lines.append(json.dumps({'error': message}, ensure_ascii=False))
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+        raise
+    finally:
+        session.close()
+
+@view_config(route_name='export_reviews', request_method='GET')
+def export_reviews(request):
+    """
+    GET /api/reviews/export?format=ndjson|csv
+    Streams every review (oldest first) as newline-delimited JSON or CSV.
+    Accepts the same sentiment/product_name/language/date_from/date_to filters as /api/reviews.
+    A failed export ends with {"error": ...} (ndjson) or a "#error" row (csv) and a dropped connection
+    """
+    params = request.params
+    export_format = params.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return error_response('Format export harus ndjson atau csv', 400)
+    try:
+        date_from = parse_date_param(params['date_from']) if params.get('date_from') else None
+        date_to = parse_date_param(params['date_to'], end_of_day=True) if params.get('date_to') else None
+    except Exception:
+        return error_response('Parameter query tidak valid', 400)
+
+    logger.info(f"Streaming reviews export ({export_format})")
+    if export_format == 'csv':
+        content_type = 'text/csv'
+        filename = 'reviews.csv'
+    else:
+        content_type = 'application/x-ndjson'
+        filename = 'reviews.ndjson'
+
+    response = Response(
+        app_iter=iter_review_export(params, export_format, date_from, date_to),
+        content_type=content_type,
+        charset='utf-8'
+    )
+    response.content_disposition = f'attachment; filename="{filename}"'
+    return response
+
+@view_config(route_name='get_stats', renderer='json', request_method='GET')
+def get_stats(request):
+    """
+    GET /api/stats
+    Query: product_name, language, sentiment, date_from, date_to, bucket=day|week|month
+    Counts, mean confidence and trends served from the sentiment_rollups table
+    """
+    from sentiment_stats import BUCKETS, query_stats
+
+    params = request.params
+    bucket = params.get('bucket', 'day')
+    try:
+        if bucket not in BUCKETS:
+            raise ValueError('bucket')
+        date_from = parse_date_param(params['date_from']) if params.get('date_from') else None
+        date_to = parse_date_param(params['date_to'], end_of_day=True) if params.get('date_to') else None
+    except Exception:
+        return error_response('Parameter query tidak valid', 400)
+
+    try:
+        return query_stats(
+            request.dbsession,
+            product_name=params.get('product_name'),
+            language=params.get('language'),
+            sentiment=params.get('sentiment'),
+            date_from=date_from,
+            date_to=date_to,
+            bucket=bucket
+        )
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_stats: {e}")
+        logger.error(traceback.format_exc())
+        return error_response('Gagal mengambil statistik', 500)
+
+@view_config(route_name='product_summary', renderer='json', request_method='GET')
+def product_summary(request):
+    """
+    GET /api/products/{product_name}/summary
+    Query: limit (number of aspects, default 20)
+    Aspects mentioned in the product's key points, ranked by mentions, with
+    sentiment counts per aspect
+    """
+    try:
+        from product_summary import summarize
+        try:
+            limit = min(max(int(request.params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return error_response('Parameter query tidak valid', 400)
+
+        product_name = request.matchdict['product_name']
+        summary = summarize(request.dbsession, product_name, limit=limit)
+        if not summary['aspects'] and not summary['reviews']['count']:
+            return error_response('Produk tidak ditemukan', 404)
+        return summary
+
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in product_summary: {e}")
+        logger.error(traceback.format_exc())
+        return error_response('Gagal mengambil ringkasan produk', 500)
+
+@view_config(route_name='db_stats', renderer='json', request_method='GET')
+def db_stats(request):
+    """
+    GET /api/db-stats
+    Connection pool state (checked out, overflow) and checkout wait/timeout counters
+    """
+    from models import get_pool_stats
+    return get_pool_stats()
+
+@view_config(route_name='metrics', request_method='GET')
+def metrics_view(request):
+    """
+    GET /metrics
+    Request counters, latency and per-stage histograms plus scheduler, cache,
+    connection pool and Gemini client gauges in the Prometheus text format
+    """
+    from models import get_pool_stats
+
+    gauges = {}
+
+    def add(prefix, stats, help_text):
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            gauges[f'{prefix}_{key}'] = (f'{help_text}: {key}', value)
+
+    add('db_pool', get_pool_stats(), 'Database connection pool')
+    analyzer = sentiment_analyzer
+    if analyzer is not None and hasattr(analyzer, 'stats'):
+        scheduler = analyzer.stats()
+        add('scheduler', scheduler, 'Inference scheduler')
+        gauges['scheduler_batch_size_total'] = (
+            'Inference scheduler batches by size bucket',
+            {('size', bucket): count for bucket, count in scheduler['batch_size_histogram'].items()}
         )
+    if result_cache is not None:
+        add('result_cache', result_cache.stats(), 'Result cache')
+    if gemini_analyzer is not None and hasattr(gemini_analyzer, 'stats'):
+        add('gemini', gemini_analyzer.stats(), 'Gemini client')
+
+    return Response(
+        metrics.render(gauges),
+        content_type='text/plain',
+        charset='utf-8'
+    )
+
+@view_config(route_name='scheduler_stats', renderer='json', request_method='GET')
+def scheduler_stats(request):
+    """
+    GET /api/scheduler-stats
+    Queue depth and batch size histogram of the inference scheduler
+    """
+    analyzer = sentiment_analyzer
+    if analyzer is None or not hasattr(analyzer, 'stats'):
+        return {'enabled': SCHEDULER_ENABLED, 'loaded': analyzer is not None}
+    return dict(analyzer.stats(), enabled=True, loaded=True)
+
+@view_config(route_name='cache_stats', renderer='json', request_method='GET')
+def cache_stats(request):
+    """
+    GET /api/cache-stats
+    Hit/miss counters of the result cache
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return {'enabled': False}
+    return dict(cache.stats(), enabled=True)
+
+@view_config(route_name='ready', renderer='json', request_method='GET')
+def readiness_check(request):
+    """
+    Readiness probe: 503 until the warmup started by PRELOAD_MODELS has loaded
+    the sentiment model. Always ready when preloading is disabled (lazy mode)
+    """
+    state = dict(warmup_state, errors=dict(warmup_state['errors']))
+    ready = not state['started'] or (state['done'] and state['sentiment'])
+    if not ready:
+        request.response.status = 503
+    return dict(state, ready=ready)
 
 @view_config(route_name='health', renderer='json', request_method='GET')
 def health_check(request):
@@ -24,6 +24,8 @@ function App() {
   const [error, setError] = useState(null);
   const [reviews, setReviews] = useState([]);
   const [loadingReviews, setLoadingReviews] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchReviews();
@@ -37,6 +39,8 @@ function App() {
         (a, b) => new Date(b.created_at) - new Date(a.created_at)
       );
       setReviews(sortedReviews);
+      // Halaman berikutnya (tidak ada di halaman terakhir)
+      setNextCursor(response.headers["x-next-cursor"] || null);
     } catch (err) {
       console.error("Error fetching reviews:", err);
     } finally {
@@ -44,6 +48,27 @@ function App() {
     }
   };
 
+  const loadMoreReviews = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API_URL}/reviews`, {
+        params: { cursor: nextCursor },
+      });
+      setReviews((current) => {
+        const seen = new Set(current.map((review) => review.id));
+        return current.concat(
+          response.data.filter((review) => !seen.has(review.id))
+        );
+      });
+      setNextCursor(response.headers["x-next-cursor"] || null);
+    } catch (err) {
+      console.error("Error fetching more reviews:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     if (reviewText.trim().length < 10) {
@@ -246,7 +271,10 @@ function App() {
 
         {/* Previous Reviews */}
         <section className="reviews-section">
-          <h2>Review Sebelumnya ({reviews.length})</h2>
+          <h2>
+            Review Sebelumnya ({reviews.length}
+            {nextCursor ? "+" : ""})
+          </h2>
           {loadingReviews ? (
             <p className="no-reviews-message">Memuat reviews...</p>
           ) : reviews.length === 0 ? (
@@ -285,6 +313,15 @@ function App() {
               ))}
             </div>
           )}
+          {!loadingReviews && nextCursor && (
+            <button
+              className="load-more-button"
+              onClick={loadMoreReviews}
+              disabled={loadingMore}
+            >
+              {loadingMore ? "Memuat..." : "Muat lebih banyak"}
+            </button>
+          )}
         </section>
       </main>
 